@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import base64
+import bisect
+import copy
 import html as py_html
 import json
 import math
@@ -7,18 +10,27 @@ import os
 import re
 import unicodedata
 import time
+import threading
 import uuid
 import shutil
+import sys
 import posixpath
+import select
+import struct
 import zipfile
 import hashlib
+from collections import Counter, OrderedDict
 from io import BytesIO
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field, replace
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from flask import (
     Flask,
     abort,
+    after_this_request,
+    g,
+    has_request_context,
     jsonify,
     redirect,
     render_template,
@@ -28,12 +40,21 @@ from flask import (
     session,
     url_for,
 )
+from jinja2 import nodes
+from jinja2.ext import Extension
 from markupsafe import Markup, escape
+from werkzeug.exceptions import HTTPException
+from werkzeug.local import LocalProxy
 
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
 
-from werkzeug.utils import secure_filename
+from werkzeug.utils import safe_join, secure_filename
+
+# dataclass(slots=True), int.bit_count() and bisect's key= need Python 3.10+; fail with a clear
+# message instead of a TypeError halfway through the module.
+if sys.version_info < (3, 10):
+    raise SystemExit("This shop requires Python 3.10 or newer.")
 
 # Stripe keys must be provided via environment variables (or a .env file in development).
 # Do NOT hardcode secret keys in the repository.
@@ -123,6 +144,12 @@ def format_pln(value: float) -> str:
     return f"{s} zł"
 
 
+_SLUG_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_SLUG_DASHES_RE = re.compile(r"-{2,}")
+
+
+# Titles and category names repeat across every request, so the NFKD pass is memoised.
+@lru_cache(maxsize=8192)
 def slugify(name: str, max_len: int = 80) -> str:
     norm = unicodedata.normalize("NFKD", (name or "").strip())
     chars = []
@@ -134,12 +161,40 @@ def slugify(name: str, max_len: int = 80) -> str:
         else:
             chars.append("-")
     s = "".join(chars).lower()
-    s = re.sub(r"[^a-z0-9]+", "-", s)
-    s = re.sub(r"-{2,}", "-", s).strip("-")
+    s = _SLUG_NON_ALNUM_RE.sub("-", s)
+    s = _SLUG_DASHES_RE.sub("-", s).strip("-")
     s = s or "item"
     return s[:max_len] if len(s) > max_len else s
 
 
+# Polish alphabet order: letters with diacritics are separate letters sorted right after
+# their base letter (a < ą < b ... z < ź < ż). Digits sort before letters; anything else
+# is folded to its base letter when possible and otherwise ordered by code point.
+_PL_ALPHABET = "aąbcćdeęfghijklłmnńoópqrsśtuvwxyzźż"
+_PL_RANK = {ch: i for i, ch in enumerate(_PL_ALPHABET)}
+
+
+@lru_cache(maxsize=16384)
+def polish_sort_key(text: str) -> Tuple[int, ...]:
+    key: List[int] = []
+    for ch in (text or "").lower():
+        rank = _PL_RANK.get(ch)
+        if rank is None and not ch.isdigit():
+            base = unicodedata.normalize("NFKD", ch)[:1]
+            rank = _PL_RANK.get(base)
+        if rank is not None:
+            key.append(1000 + rank)
+        elif ch.isdigit():
+            key.append(500 + int(ch) if ch.isascii() else 500)
+        elif ch.isspace():
+            key.append(0)
+        elif ch.isascii():
+            key.append(100 + ord(ch))     # ASCII punctuation before digits, as in plain str order
+        else:
+            key.append(2000 + ord(ch))
+    return tuple(key)
+
+
 # -------------------------
 # DocuBeauty dynamic catalog (48 kategorii z lokalnego katalogu "produkty")
 # -------------------------
@@ -217,9 +272,12 @@ def item_id_from_path(rel_path: str) -> str:
     return f"{slugify(base)}-{h}"
 
 
+PRICE_BUCKETS = (19, 29, 39, 49, 59, 69)
+
+
 def _docubeauty_price_bucket(value: float) -> float:
     """Snap a raw value to a small set of 'normal' PLN prices used in the shop UI."""
-    buckets = [19, 29, 39, 49, 59, 69]
+    buckets = PRICE_BUCKETS
     try:
         v = float(value)
     except Exception:
@@ -300,45 +358,336 @@ def list_docubeauty_items_for_category(cat: Dict[str, Any]) -> List[Dict[str, An
     zp = cat.get("source_path") or ""
     if not zp or not os.path.isfile(zp):
         return []
-    try:
-        with zipfile.ZipFile(zp, "r") as zf:
-            for info in zf.infolist():
-                member = info.filename
-                if not member or member.endswith("/"):
-                    continue
-                member_raw = member
-                display = member_raw.replace("\\", "/")
-                if display.startswith("__MACOSX/") or display.lower().endswith(".ds_store"):
-                    continue
-                items.append(
-                    {
-                        "display": display,
-                        "rel": member_raw,
-                        "abs": None,
-                        "id": item_id_from_path(member_raw),
-                        "ext": os.path.splitext(member)[1].lower(),
-                    }
-                )
-    except Exception:
+    members = load_zip_listing(zp, str(cat.get("slug") or ""))
+    if members is None:
         return []
+    for m in members:
+        member_raw = m["name"]
+        items.append(
+            {
+                "display": member_raw.replace("\\", "/"),
+                "rel": member_raw,
+                "abs": None,
+                "id": m["id"],
+                "ext": os.path.splitext(member_raw)[1].lower(),
+            }
+        )
     items.sort(key=lambda x: x["display"].lower())
     return items
 
 
+# Parsed ZIP central directories, persisted across workers and redeploys:
+#   data/cache/zip_index/<slug>.json
+# Kept out of static/: the listings hold server paths and the full contents of paid bundles.
+# An entry is reused only while the ZIP's path, size and mtime are unchanged.
+ZIP_INDEX_CACHE_DIR = os.path.join(BASE_DIR, "data", "cache", "zip_index")
+ZIP_INDEX_FORMAT = 1
+
+
+def _read_zip_members(zp: str) -> List[Dict[str, Any]]:
+    members: List[Dict[str, Any]] = []
+    with zipfile.ZipFile(zp, "r") as zf:
+        for info in zf.infolist():
+            member = info.filename
+            if not member or member.endswith("/"):
+                continue
+            display = member.replace("\\", "/")
+            if display.startswith("__MACOSX/") or display.lower().endswith(".ds_store"):
+                continue
+            members.append(
+                {
+                    "name": member,
+                    "file_size": info.file_size,
+                    "compress_size": info.compress_size,
+                    "compress_type": info.compress_type,
+                    "header_offset": info.header_offset,
+                    "id": item_id_from_path(member),
+                }
+            )
+    return members
+
+
+def load_zip_listing(zp: str, slug: str = "") -> Optional[List[Dict[str, Any]]]:
+    """Return the (filtered) member listing of a category ZIP, or None if it cannot be read.
+
+    The listing is served from data/cache/zip_index/<slug>.json when that file was written
+    for the same ZIP path, size and mtime; otherwise the central directory is parsed once
+    and the cache file is (re)written.
+    """
+    try:
+        st = os.stat(zp)
+    except OSError:
+        return None
+    key = {"path": os.path.abspath(zp), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    cache_name = f"{slug or slugify(os.path.splitext(os.path.basename(zp))[0])}.json"
+    cache_path = os.path.join(ZIP_INDEX_CACHE_DIR, cache_name)
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if (
+            isinstance(cached, dict)
+            and cached.get("format") == ZIP_INDEX_FORMAT
+            and all(cached.get(k) == v for k, v in key.items())
+            and isinstance(cached.get("members"), list)
+        ):
+            return cached["members"]
+    except Exception:
+        pass
+
+    try:
+        members = _read_zip_members(zp)
+    except Exception:
+        return None
+
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(ZIP_INDEX_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": ZIP_INDEX_FORMAT, **key, "members": members}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        # Best-effort; a read-only disk only costs us the warm start.
+        try:
+            os.remove(tmp_path)
+        except Exception:
+            pass
+    return members
+
+
 def get_docubeauty_category(app_dir: str, slug: str) -> Optional[Dict[str, Any]]:
-    for c in scan_docubeauty_categories(app_dir):
-        if c.get("slug") == slug:
-            return c
-    return None
+    return get_docubeauty_index(app_dir).category(slug)
 
 
-def get_docubeauty_item_by_id(cat: Dict[str, Any], item_id: str) -> Optional[Dict[str, Any]]:
+def get_docubeauty_item_by_id(
+    cat: Dict[str, Any],
+    item_id: str,
+    index: Optional["DocuBeautyIndex"] = None,
+) -> Optional[Dict[str, Any]]:
+    if index is not None:
+        return index.item(str(cat.get("slug") or ""), item_id)
     for it in list_docubeauty_items_for_category(cat):
         if it.get("id") == item_id:
             return it
     return None
 
 
+@dataclass
+class DocuBeautyIndex:
+    """DocuBeauty categories and their items, built in ONE pass over the products root.
+
+    Every category is scanned once and every ZIP is opened once; lookups by category slug
+    and by (slug, item id) are plain dict hits afterwards.
+    """
+    categories: List[Dict[str, Any]]                  # sorted like scan_docubeauty_categories()
+    by_slug: Dict[str, Dict[str, Any]]
+    items: Dict[str, List[Dict[str, Any]]]            # slug -> items (sorted by display name)
+    items_by_id: Dict[str, Dict[str, Dict[str, Any]]]  # slug -> item id -> item
+    prices: Dict[Tuple[str, str], float]              # (slug, item id) -> per-file price
+    thumbs: Dict[Tuple[str, str], str]                # (slug, item id) -> cards/items/... (only if present)
+    card_images: Dict[str, str]                       # slug -> category card image (static rel path)
+    # source_path -> (source signature, per-category entry); lets the next build reuse
+    # every category whose ZIP/folder and previews did not change.
+    sources: Dict[str, Tuple[Tuple[Any, ...], Dict[str, Any]]] = field(default_factory=dict)
+
+    def category(self, slug: str) -> Optional[Dict[str, Any]]:
+        return self.by_slug.get(slug)
+
+    def item(self, slug: str, item_id: str) -> Optional[Dict[str, Any]]:
+        return self.items_by_id.get(slug, {}).get(item_id)
+
+    def item_ids(self, slug: str) -> List[str]:
+        return [str(it.get("id") or "") for it in self.items.get(slug, []) if it.get("id")]
+
+
+def _index_docubeauty_category(app_dir: str, c: Dict[str, Any]) -> Dict[str, Any]:
+    """List one category and precompute its prices, previews and card image."""
+    slug = str(c.get("slug") or "")
+    static_dir = os.path.join(app_dir, "static")
+
+    try:
+        raw_items = list_docubeauty_items_for_category(c)
+    except Exception:
+        raw_items = []
+    items_by_id: Dict[str, Dict[str, Any]] = {}
+    for it in raw_items:
+        item_id = str(it.get("id") or "")
+        if item_id:
+            items_by_id.setdefault(item_id, it)
+
+    # One listdir per category instead of one exists() per item.
+    try:
+        previews = set(os.listdir(os.path.join(static_dir, "cards", "items", slug)))
+    except OSError:
+        previews = set()
+
+    try:
+        pf = float(c.get("price_from") or 0.0)
+    except Exception:
+        pf = 0.0
+    n_items = len(raw_items)
+    prices: Dict[Tuple[str, str], float] = {}
+    thumbs: Dict[Tuple[str, str], str] = {}
+    for it in raw_items:
+        item_id = str(it.get("id") or "")
+        if not item_id:
+            continue
+        prices[(slug, item_id)] = docubeauty_item_price(pf, n_items, it.get("rel") or item_id)
+        if f"{item_id}.png" in previews:
+            thumbs[(slug, item_id)] = f"cards/items/{slug}/{item_id}.png"
+
+    # Category card: use the first item's preview if available (DocuBeauty behavior),
+    # then the prebuilt category card (if present).
+    img = "cards/_placeholder.png"
+    first_id = str(raw_items[0].get("id") or "") if raw_items else ""
+    if first_id and (slug, first_id) in thumbs:
+        img = thumbs[(slug, first_id)]
+    if img == "cards/_placeholder.png":
+        fallback = str(c.get("card_rel") or "").strip()
+        if fallback and os.path.exists(os.path.join(static_dir, fallback)):
+            img = fallback
+
+    return {
+        "items": raw_items,
+        "items_by_id": items_by_id,
+        "prices": prices,
+        "thumbs": thumbs,
+        "card_image": img,
+    }
+
+
+def build_docubeauty_index(app_dir: str, previous: Optional[DocuBeautyIndex] = None) -> DocuBeautyIndex:
+    """Build the index; categories unchanged since `previous` are reused without any I/O."""
+    cats = scan_docubeauty_categories(app_dir)
+
+    by_slug: Dict[str, Dict[str, Any]] = {}
+    items: Dict[str, List[Dict[str, Any]]] = {}
+    items_by_id: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    prices: Dict[Tuple[str, str], float] = {}
+    thumbs: Dict[Tuple[str, str], str] = {}
+    card_images: Dict[str, str] = {}
+    sources: Dict[str, Tuple[Tuple[Any, ...], Dict[str, Any]]] = {}
+
+    for c in cats:
+        slug = str(c.get("slug") or "")
+        if not slug:
+            continue
+        by_slug.setdefault(slug, c)
+        if slug in items:
+            # Two sources slugify to the same name; the first one wins (as before).
+            continue
+
+        source_path = str(c.get("source_path") or "")
+        sig = docubeauty_category_sig(app_dir, c)
+        reused = previous.sources.get(source_path) if previous is not None else None
+        if reused is not None and reused[0] == sig:
+            entry = reused[1]
+        else:
+            entry = _index_docubeauty_category(app_dir, c)
+        sources[source_path] = (sig, entry)
+
+        items[slug] = entry["items"]
+        items_by_id[slug] = entry["items_by_id"]
+        prices.update(entry["prices"])
+        thumbs.update(entry["thumbs"])
+        card_images[slug] = entry["card_image"]
+
+    return DocuBeautyIndex(
+        categories=cats,
+        by_slug=by_slug,
+        items=items,
+        items_by_id=items_by_id,
+        prices=prices,
+        thumbs=thumbs,
+        card_images=card_images,
+        sources=sources,
+    )
+
+
+def _stat_sig(path: str) -> Tuple[int, int, int]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (0, 0, -1)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _source_sig_parts(full: str) -> List[Tuple[str, Tuple[int, int, int]]]:
+    """A ZIP by size/mtime; a folder by its directory mtimes (add/remove/rename anywhere inside)."""
+    parts = [(full, _stat_sig(full))]
+    if os.path.isdir(full):
+        for r, dirs, _ in os.walk(full):
+            dirs.sort()
+            for d in dirs:
+                sub = os.path.join(r, d)
+                parts.append((sub, _stat_sig(sub)))
+    return parts
+
+
+def docubeauty_category_sig(app_dir: str, c: Dict[str, Any]) -> Tuple[Any, ...]:
+    """stat()-only signature of one category: its source plus its preview folder and card."""
+    slug = str(c.get("slug") or "")
+    static_dir = os.path.join(app_dir, "static")
+    parts = _source_sig_parts(str(c.get("source_path") or ""))
+    previews = os.path.join(static_dir, "cards", "items", slug)
+    parts.append((previews, _stat_sig(previews)))
+    card = os.path.join(static_dir, str(c.get("card_rel") or ""))
+    parts.append((card, _stat_sig(card)))
+    return tuple(parts)
+
+
+def docubeauty_fingerprint(app_dir: str) -> Tuple[Tuple[str, Tuple[int, int, int]], ...]:
+    """stat()-only fingerprint of everything build_docubeauty_index() reads.
+
+    ZIPs are keyed by size/mtime, folders by their directory mtimes (which change whenever
+    a file is added, removed or renamed), previews by the static/cards folder mtimes.
+    """
+    parts: List[Tuple[str, Tuple[int, int, int]]] = []
+
+    root = DOCUBEAUTY_PRODUCTS_ROOT
+    if root and os.path.isdir(root):
+        parts.append((root, _stat_sig(root)))
+        try:
+            entries = sorted(os.listdir(root))
+        except OSError:
+            entries = []
+        for name in entries:
+            parts.extend(_source_sig_parts(os.path.join(root, name)))
+
+    cards_dir = os.path.join(app_dir, "static", "cards")
+    items_dir = os.path.join(cards_dir, "items")
+    parts.append((cards_dir, _stat_sig(cards_dir)))
+    parts.append((items_dir, _stat_sig(items_dir)))
+    try:
+        item_dirs = sorted(os.listdir(items_dir))
+    except OSError:
+        item_dirs = []
+    for name in item_dirs:
+        full = os.path.join(items_dir, name)
+        parts.append((full, _stat_sig(full)))
+
+    return tuple(parts)
+
+
+_DOCU_INDEX_LOCK = threading.Lock()
+_DOCU_INDEX_CACHE: Dict[str, Tuple[Tuple[Any, ...], DocuBeautyIndex]] = {}
+
+
+def get_docubeauty_index(app_dir: str, fingerprint: Optional[Tuple[Any, ...]] = None) -> DocuBeautyIndex:
+    """Return the cached DocuBeautyIndex, re-indexing only the categories that changed."""
+    fp = fingerprint if fingerprint is not None else docubeauty_fingerprint(app_dir)
+    cached = _DOCU_INDEX_CACHE.get(app_dir)
+    if cached is not None and cached[0] == fp:
+        return cached[1]
+    with _DOCU_INDEX_LOCK:
+        cached = _DOCU_INDEX_CACHE.get(app_dir)
+        if cached is not None and cached[0] == fp:
+            return cached[1]
+        index = build_docubeauty_index(app_dir, previous=cached[1] if cached is not None else None)
+        _DOCU_INDEX_CACHE[app_dir] = (fp, index)
+        return index
+
+
 def ensure_cached_dir_zip(app_dir: str, cat: Dict[str, Any]) -> str:
     """Create (or reuse) a ZIP bundle for a directory-category and return its path.
     Cached under static/cache/docubeauty_bundles/<slug>/...
@@ -421,20 +770,21 @@ def ensure_cached_zip_member(app_dir: str, cat: Dict[str, Any], item: Dict[str,
     raise FileNotFoundError("Member not found in zip")
 
 
-def build_docubeauty_products(app_dir: str) -> List["Product"]:
+def build_docubeauty_products(app_dir: str, index: Optional[DocuBeautyIndex] = None) -> List["Product"]:
     """Build shop Product list from DocuBeauty **categories** and their **items**.
 
     UX goal (per request):
     - Category cards are used for navigation (no pricing / no cart).
     - Pricing and cart actions belong to the individual files inside each category.
     """
-    cats = scan_docubeauty_categories(app_dir)
-    if not cats:
+    if index is None:
+        index = get_docubeauty_index(app_dir)
+    if not index.categories:
         return []
 
     products: List[Product] = []
     item_products: List[Product] = []
-    for c in cats:
+    for c in index.categories:
         slug = str(c.get("slug") or "")
         title = str(c.get("display_name") or c.get("name") or "").strip()
         if not slug or not title:
@@ -444,26 +794,7 @@ def build_docubeauty_products(app_dir: str) -> List["Product"]:
         price = 0.0
 
         desc = str(c.get("short_desc") or "").strip()
-        # Category card: use the first item's preview if available (DocuBeauty behavior).
-        img = "cards/_placeholder.png"
-        try:
-            cat = get_docubeauty_category(app_dir, slug)
-            if cat:
-                items = list_docubeauty_items_for_category(cat)
-                if items:
-                    first_id = items[0].get("id")
-                    if first_id:
-                        cand = f"cards/items/{slug}/{first_id}.png"
-                        if os.path.exists(os.path.join(app_dir, "static", cand)):
-                            img = cand
-        except Exception:
-            pass
-
-        # Fallback to prebuilt category card (if present)
-        if img == "cards/_placeholder.png":
-            fallback = str(c.get("card_rel") or "").strip()
-            if fallback and os.path.exists(os.path.join(app_dir, "static", fallback)):
-                img = fallback
+        img = index.card_images.get(slug) or "cards/_placeholder.png"
         pid = f"dbcat:{slug}"
 
         products.append(
@@ -483,57 +814,50 @@ def build_docubeauty_products(app_dir: str) -> List["Product"]:
         )
 
         # Build sellable item-products inside this category.
-        try:
-            cat_obj = get_docubeauty_category(app_dir, slug)
-            if cat_obj:
-                raw_items = list_docubeauty_items_for_category(cat_obj)
-                n_items = len(raw_items)
-                try:
-                    pf = float(c.get("price_from") or 0.0)
-                except Exception:
-                    pf = 0.0
-
-                for it in raw_items:
-                    item_id = str(it.get("id") or "")
-                    if not item_id:
-                        continue
-
-                    filename = str(it.get("display") or "").rsplit("/", 1)[-1].strip()
-                    if not filename:
-                        filename = item_id
+        for it in index.items.get(slug, []):
+            item_id = str(it.get("id") or "")
+            if not item_id:
+                continue
 
-                    thumb_rel = f"cards/items/{slug}/{item_id}.png"
-                    item_img = img
-                    if os.path.exists(os.path.join(app_dir, "static", thumb_rel)):
-                        item_img = thumb_rel
+            filename = str(it.get("display") or "").rsplit("/", 1)[-1].strip()
+            if not filename:
+                filename = item_id
 
-                    item_pid = f"dbitem:{slug}:{item_id}"
-                    item_price = docubeauty_item_price(pf, n_items, it.get("rel") or item_id)
+            item_img = index.thumbs.get((slug, item_id)) or img
+            item_pid = f"dbitem:{slug}:{item_id}"
+            item_price = index.prices.get((slug, item_id), 0.0)
 
-                    item_products.append(
-                        Product(
-                            id=item_pid,
-                            title=filename,
-                            category=title,  # show category name in cart
-                            category_url="",
-                            price_pln=float(item_price),
-                            description="",
-                            images=(item_img,) if item_img else tuple(),
-                            image_source="static",
-                            source_url="",
-                            docu_cat_slug=slug,
-                            docu_item_id=item_id,
-                        )
-                    )
-        except Exception:
-            # If file listing fails, keep the category card.
-            pass
+            item_products.append(
+                Product(
+                    id=item_pid,
+                    title=filename,
+                    category=title,  # show category name in cart
+                    category_url="",
+                    price_pln=float(item_price),
+                    description="",
+                    images=(item_img,) if item_img else tuple(),
+                    image_source="static",
+                    source_url="",
+                    docu_cat_slug=slug,
+                    docu_item_id=item_id,
+                )
+            )
 
     # Stable ordering
     products.sort(key=lambda p: p.title.lower())
     item_products.sort(key=lambda p: (p.category.lower(), p.title.lower()))
     return products + item_products
 
+
+_DESC_BR_RE = re.compile(r"(?i)<br\s*/?>")
+_DESC_TAG_RE = re.compile(r"<[^>]+>")
+_DESC_BULLET_RE = re.compile(r"^(\*|-|•)\s+(.*)$")
+_DESC_NUMBERED_RE = re.compile(r"^(\d+)[\.)]\s+(.*)$")
+
+
+# Rendered on every product page view; descriptions change only via /edit, so the
+# result (an immutable Markup) is memoised per raw text.
+@lru_cache(maxsize=2048)
 def format_description_html(raw: str) -> Markup:
     """
     Converts scraped description (often containing literal <br>) into safe structured HTML.
@@ -547,8 +871,8 @@ def format_description_html(raw: str) -> Markup:
     s = str(raw)
     s = py_html.unescape(s)
     s = s.replace("\r\n", "\n").replace("\r", "\n")
-    s = re.sub(r"(?i)<br\s*/?>", "\n", s)
-    s = re.sub(r"<[^>]+>", "", s)  # strip all tags
+    s = _DESC_BR_RE.sub("\n", s)
+    s = _DESC_TAG_RE.sub("", s)  # strip all tags
 
     lines = [ln.strip() for ln in s.split("\n")]
     out_parts: List[str] = []
@@ -567,12 +891,12 @@ def format_description_html(raw: str) -> Markup:
             flush_list()
             continue
 
-        m = re.match(r"^(\*|-|•)\s+(.*)$", ln)
+        m = _DESC_BULLET_RE.match(ln)
         if m:
             list_items.append(m.group(2).strip())
             continue
 
-        m = re.match(r"^(\d+)[\.)]\s+(.*)$", ln)
+        m = _DESC_NUMBERED_RE.match(ln)
         if m:
             list_items.append(f"{m.group(1)}. {m.group(2).strip()}")
             continue
@@ -603,7 +927,9 @@ def is_mobile_request() -> bool:
 # -------------------------
 # Model
 # -------------------------
-@dataclass(frozen=True)
+# Slotted: one catalog holds an instance per DocuBeauty file plus imported 1cart products,
+# and every worker keeps its own copy, so the per-instance __dict__ is dropped.
+@dataclass(frozen=True, slots=True)
 class Product:
     id: str
     title: str
@@ -617,7 +943,18 @@ class Product:
     download_file: str = ""
     docu_cat_slug: str = ""
     docu_item_id: str = ""
-
+    # Derived once per instance (also after dataclasses.replace) so request loops never slugify.
+    title_slug: str = field(init=False, repr=False, compare=False)
+    category_slug: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Category names and docu slugs repeat across many products; share one string each.
+        if isinstance(self.category, str):
+            object.__setattr__(self, "category", sys.intern(self.category))
+        if self.docu_cat_slug:
+            object.__setattr__(self, "docu_cat_slug", sys.intern(self.docu_cat_slug))
+        object.__setattr__(self, "title_slug", slugify(str(self.title or "")))
+        object.__setattr__(self, "category_slug", slugify(str(self.category or "")))
 
     def display_price(self) -> str:
         return format_pln(self.price_pln)
@@ -628,6 +965,1286 @@ class Product:
     def primary_image(self) -> Optional[str]:
         return self.images[0] if self.images else None
 
+    def is_category_card(self) -> bool:
+        """True for navigation cards: dbcat:..., cat:... and anything with a docu slug but no item id."""
+        return bool((self.docu_cat_slug and not self.docu_item_id) or self.id.startswith("cat:"))
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSnapshot:
+    """Immutable catalog built from one set of on-disk inputs (see catalog_fingerprint).
+
+    Lookup indexes are built once together with the products so request handlers never
+    scan the catalog for a single product. Lists keep catalog order; on duplicate keys the
+    first product wins (same as the `next(...)` scans they replace).
+    """
+    version: str                 # short hash of the fingerprint; changes whenever the catalog does
+    fingerprint: Tuple[Any, ...]
+    products: Tuple[Product, ...]
+    docu_index: DocuBeautyIndex
+    built_at: float
+    is_docu_mode: bool = False
+    menu: Tuple[Product, ...] = ()                                    # /shop category menu source
+    by_id: Dict[str, Product] = field(default_factory=dict)
+    position: Dict[str, int] = field(default_factory=dict)            # product id -> catalog order
+    by_docu_item: Dict[Tuple[str, str], Product] = field(default_factory=dict)
+    by_category_slug: Dict[str, Tuple[Product, ...]] = field(default_factory=dict)  # /shop?category=
+    custom_by_slug: Dict[str, Tuple[Product, ...]] = field(default_factory=dict)    # docu slug or category slug
+    assets: Optional[AssetManifest] = None
+    search: Optional[SearchIndex] = None                             # /shop?q= full-text index
+    suggest: Optional[SuggestIndex] = None                           # /api/search_suggest
+    trigrams: Optional[TrigramIndex] = None                          # typo-tolerant fallback
+    # /shop listings, already ordered: (category slug or "" for the default listing, sort) -> products
+    sorted_views: Dict[Tuple[str, str], Tuple[Product, ...]] = field(default_factory=dict)
+    view_masks: Dict[str, int] = field(default_factory=dict)         # listing -> FacetIndex bits
+    facets: Optional[FacetIndex] = None
+    menu_categories: Tuple[Dict[str, str], ...] = ()                 # /shop sidebar
+
+    SORTS = ("", "price_asc", "price_desc")
+
+    @classmethod
+    def build(
+        cls,
+        version: str,
+        fingerprint: Tuple[Any, ...],
+        products: Tuple[Product, ...],
+        docu_index: DocuBeautyIndex,
+        assets: Optional[AssetManifest] = None,
+    ) -> "CatalogSnapshot":
+        is_docu_mode = any(p.docu_cat_slug for p in products)
+        menu = tuple(p for p in products if p.is_category_card()) if is_docu_mode else products
+
+        by_id: Dict[str, Product] = {}
+        position: Dict[str, int] = {}
+        by_docu_item: Dict[Tuple[str, str], Product] = {}
+        for i, p in enumerate(products):
+            by_id.setdefault(p.id, p)
+            position.setdefault(p.id, i)
+            if p.docu_cat_slug and p.docu_item_id:
+                by_docu_item.setdefault((p.docu_cat_slug, p.docu_item_id), p)
+
+        # /shop?category=<slug> (mirrors the per-request filter it replaces):
+        # - category cards match by title slug; in DocuBeauty mode they are never listed
+        # - when <slug> names a DocuBeauty category card, products carrying a docu slug
+        #   match by that slug; everything else matches by slugify(category)
+        docu_slug_by_card: Dict[str, str] = {}
+        card_slugs_by_docu: Dict[str, List[str]] = {}
+        if is_docu_mode:
+            for p in menu:
+                if p.docu_cat_slug and not p.docu_item_id:
+                    s = p.title_slug
+                    if s not in docu_slug_by_card:
+                        docu_slug_by_card[s] = p.docu_cat_slug
+                        card_slugs_by_docu.setdefault(p.docu_cat_slug, []).append(s)
+
+        by_category: Dict[str, List[Product]] = {}
+        custom_by: Dict[str, List[Product]] = {}
+        for p in products:
+            cat_slug = p.category_slug
+            if p.id.startswith("custom:"):
+                for k in {p.docu_cat_slug, cat_slug}:
+                    if k:
+                        custom_by.setdefault(k, []).append(p)
+
+            if p.is_category_card():
+                if not is_docu_mode:
+                    by_category.setdefault(p.title_slug, []).append(p)
+                continue
+
+            keys: List[str] = []
+            selected = docu_slug_by_card.get(cat_slug)
+            if not (selected and p.docu_cat_slug and p.docu_cat_slug != selected):
+                keys.append(cat_slug)
+            if p.docu_cat_slug:
+                keys.extend(s for s in card_slugs_by_docu.get(p.docu_cat_slug, ()) if s not in keys)
+            for k in keys:
+                by_category.setdefault(k, []).append(p)
+
+        # Sorting happens once per snapshot, so /shop pagination is a plain slice.
+        sort_keys = cls._sort_keys()
+        listings: Dict[str, Iterable[Product]] = {"": menu}
+        listings.update(by_category)
+        sorted_views = {
+            (cat, sort): tuple(sorted(items, key=sort_keys[sort]))
+            for cat, items in listings.items()
+            for sort in cls.SORTS
+        }
+        view_masks = {cat: FacetIndex.mask(position[p.id] for p in items) for cat, items in listings.items()}
+
+        # Sidebar: unique categories of the menu source, in catalog order.
+        menu_categories: List[Dict[str, str]] = []
+        seen_slugs: set[str] = set()
+        for p in menu:
+            if p.is_category_card():
+                label, slug = p.title, p.title_slug
+            else:
+                label, slug = p.category, p.category_slug
+            if slug in seen_slugs:
+                continue
+            seen_slugs.add(slug)
+            menu_categories.append({"label": label, "slug": slug})
+
+        return cls(
+            version=version,
+            fingerprint=fingerprint,
+            products=products,
+            docu_index=docu_index,
+            built_at=time.time(),
+            is_docu_mode=is_docu_mode,
+            menu=menu,
+            by_id=by_id,
+            position=position,
+            by_docu_item=by_docu_item,
+            by_category_slug={k: tuple(v) for k, v in by_category.items()},
+            custom_by_slug={k: tuple(v) for k, v in custom_by.items()},
+            assets=assets,
+            search=SearchIndex(products),
+            suggest=SuggestIndex(products),
+            trigrams=TrigramIndex(t for p in products for t in search_tokens(f"{p.title} {p.category}")),
+            sorted_views=sorted_views,
+            view_masks=view_masks,
+            facets=FacetIndex(products, docu_index),
+            menu_categories=tuple(menu_categories),
+        )
+
+    @staticmethod
+    def _sort_keys() -> Dict[str, Callable[[Product], Any]]:
+        def title_key(p: Product) -> Tuple[Tuple[int, ...], str]:
+            return polish_sort_key(p.title), p.title.lower()
+
+        return {
+            "": title_key,
+            "price_asc": lambda p: (p.price_pln, title_key(p)),
+            "price_desc": lambda p: (-p.price_pln, title_key(p)),
+        }
+
+    # Fields that decide listings, menus and category keys; the title too for category cards.
+    STRUCTURAL_FIELDS = ("id", "category", "docu_cat_slug", "docu_item_id")
+
+    def patched(
+        self,
+        version: str,
+        fingerprint: Tuple[Any, ...],
+        products: Tuple[Product, ...],
+        docu_index: DocuBeautyIndex,
+        assets: Optional[AssetManifest] = None,
+    ) -> Optional["CatalogSnapshot"]:
+        """This snapshot with edited products swapped in, or None when a full build is needed.
+
+        Applies when the catalog keeps its order and every product keeps its structural
+        fields (an /edit of title, price, description or photos): positions, listings and
+        menus then stay valid, so only the changed products are re-indexed and re-sorted into
+        their views. Indexes are copied on write; the previous snapshot stays usable.
+        """
+        if docu_index is not self.docu_index or len(products) != len(self.products):
+            return None
+        changes: List[Tuple[int, Product, Product]] = []
+        for pos, (old, new) in enumerate(zip(self.products, products)):
+            if old is new or old == new:
+                continue
+            if any(getattr(old, f) != getattr(new, f) for f in self.STRUCTURAL_FIELDS):
+                return None
+            if old.is_category_card() and old.title != new.title:
+                return None  # card titles are menu labels and /shop?category= keys
+            if self.position.get(old.id) != pos:
+                return None  # duplicate id: lookups point at another product
+            changes.append((pos, old, new))
+
+        suggest = self.suggest.patched((old, new) for _, old, new in changes) if self.suggest is not None else None
+        if suggest is None and self.suggest is not None:
+            return None
+
+        swap = {id(old): new for _, old, new in changes}
+
+        def swapped(items: Tuple[Product, ...]) -> Tuple[Product, ...]:
+            if not any(id(p) in swap for p in items):
+                return items
+            return tuple(swap.get(id(p), p) for p in items)
+
+        by_id = dict(self.by_id)
+        by_docu_item = dict(self.by_docu_item)
+        for _, old, new in changes:
+            by_id[new.id] = new
+            key = (old.docu_cat_slug, old.docu_item_id)
+            if by_docu_item.get(key) is old:
+                by_docu_item[key] = new
+
+        # Re-sort only the changed products into the views that list them; equal keys keep
+        # catalog order, as with the stable sort of a full build.
+        sort_keys = self._sort_keys()
+        position = self.position
+        sorted_views: Dict[Tuple[str, str], Tuple[Product, ...]] = {}
+        for (cat, sort), items in self.sorted_views.items():
+            moved = [swap[id(p)] for p in items if id(p) in swap]
+            if not moved:
+                sorted_views[(cat, sort)] = items
+                continue
+            key = sort_keys[sort]
+            kept = [p for p in items if id(p) not in swap]
+            for p in moved:
+                bisect.insort(kept, p, key=lambda q: (key(q), position[q.id]))
+            sorted_views[(cat, sort)] = tuple(kept)
+
+        def words(p: Product) -> List[str]:
+            return search_tokens(f"{p.title} {p.category}")
+
+        return replace(
+            self,
+            version=version,
+            fingerprint=fingerprint,
+            products=products,
+            built_at=time.time(),
+            menu=swapped(self.menu),
+            by_id=by_id,
+            by_docu_item=by_docu_item,
+            by_category_slug={k: swapped(v) for k, v in self.by_category_slug.items()},
+            custom_by_slug={k: swapped(v) for k, v in self.custom_by_slug.items()},
+            assets=assets,
+            search=self.search.patched(changes) if self.search is not None else None,
+            suggest=suggest,
+            trigrams=(
+                self.trigrams.patched(
+                    [w for _, old, _ in changes for w in words(old)],
+                    [w for _, _, new in changes for w in words(new)],
+                )
+                if self.trigrams is not None
+                else None
+            ),
+            sorted_views=sorted_views,
+            facets=self.facets.patched(changes, docu_index) if self.facets is not None else None,
+        )
+
+    def custom_in(self, slugs: Iterable[str]) -> List[Product]:
+        """Custom products filed under any of `slugs` (docu slug or category slug), catalog order."""
+        found: Dict[str, Product] = {}
+        for s in slugs:
+            for p in self.custom_by_slug.get(s, ()):
+                found.setdefault(p.id, p)
+        return sorted(found.values(), key=lambda p: self.position.get(p.id, 0))
+
+
+# -------------------------
+# Static asset manifest
+# -------------------------
+def _scan_files(root: str) -> set[str]:
+    """All file paths under root, relative to it, with '/' separators."""
+    out: set[str] = set()
+    if not os.path.isdir(root):
+        return out
+    for dirpath, _, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        prefix = "" if rel_dir == "." else f"{rel_dir}/"
+        for fn in filenames:
+            out.add(prefix + fn)
+    return out
+
+
+def _scan_file_sigs(root: str, prefix: str = "", skip: Tuple[str, ...] = ()) -> Dict[str, Tuple[int, int, int]]:
+    """(inode, mtime, size) of every file under root, keyed prefix + relative '/' path.
+
+    `skip` prunes directories by that same key (e.g. "cache").
+    """
+    out: Dict[str, Tuple[int, int, int]] = {}
+    if not os.path.isdir(root):
+        return out
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        base = prefix if rel_dir == "." else f"{prefix}{rel_dir}/"
+        dirnames[:] = [d for d in dirnames if base + d not in skip]
+        for fn in filenames:
+            sig = _stat_sig(os.path.join(dirpath, fn))
+            if sig[2] >= 0:
+                out[base + fn] = sig
+    return out
+
+
+@dataclass(frozen=True, slots=True)
+class AssetManifest:
+    """Image files known to exist, scanned together with the catalog snapshot.
+
+    Thumbnail resolution on grids, carts and suggestions runs once per rendered product;
+    answering it from memory keeps those paths free of stat() calls.
+    Paths outside the scanned static roots still fall back to the filesystem.
+
+    static_sigs also covers the layout assets (css/js/img) and the image derivatives, so
+    url_for('static') can fingerprint them without a stat() per URL (see StaticFingerprints).
+    """
+    static_roots: Tuple[str, ...]     # static-relative prefixes that were scanned, e.g. "cards/"
+    static: frozenset                 # static-relative paths
+    media: frozenset                  # paths relative to export_all/images
+    static_sigs: Dict[str, Tuple[int, int, int]]  # static-relative path -> (inode, mtime, size)
+    derivatives: Dict[str, Any]       # image derivative manifest (see build_image_derivatives)
+
+    @classmethod
+    def scan(cls, static_dir: str, media_dir: str, static_roots: Tuple[str, ...] = ("cards", "uploads")) -> "AssetManifest":
+        # static/cache holds extracted bundles and thumbnails; of it only the derivatives
+        # are linked through url_for('static').
+        sigs = _scan_file_sigs(static_dir, skip=("cache",))
+        sigs.update(
+            _scan_file_sigs(os.path.join(static_dir, *IMAGE_DERIVATIVE_DIR.split("/")), prefix=f"{IMAGE_DERIVATIVE_DIR}/")
+        )
+        roots = tuple(f"{r}/" for r in static_roots)
+        try:
+            with open(os.path.join(static_dir, *IMAGE_DERIVATIVE_DIR.split("/"), "manifest.json"), "r", encoding="utf-8") as f:
+                derivatives = json.load(f)
+        except Exception:
+            derivatives = {}
+        return cls(
+            static_roots=roots,
+            static=frozenset(rel for rel in sigs if rel.startswith(roots)),
+            media=frozenset(_scan_files(media_dir)),
+            static_sigs=sigs,
+            derivatives=derivatives if isinstance(derivatives, dict) else {},
+        )
+
+    def static_exists(self, rel: str, static_dir: str) -> bool:
+        rel = (rel or "").replace("\\", "/").lstrip("/")
+        if rel.startswith(self.static_roots):
+            return rel in self.static
+        return os.path.exists(os.path.join(static_dir, rel))
+
+    def media_exists(self, rel: str) -> bool:
+        return (rel or "").replace("\\", "/").lstrip("/") in self.media
+
+
+class StaticFingerprints:
+    """Content-hash fingerprints for files under static/, used as the ?v= cache buster.
+
+    Digests depend only on file bytes, so every worker and every restart emits the same URL
+    for an unchanged file. A file is hashed on first use and again only when its
+    (inode, mtime, size) signature moves.
+    """
+
+    def __init__(self, root: str, length: int = 12) -> None:
+        self.root = os.path.abspath(root)
+        self.length = length
+        self._digests: Dict[str, Tuple[Tuple[int, int, int], str]] = {}
+
+    def get(self, rel: str, sig: Optional[Tuple[int, int, int]] = None) -> str:
+        """Fingerprint of static/<rel>, or "" when it is missing or outside the root.
+
+        `sig` is the file's known signature (from an AssetManifest); without it the file is stat()ed.
+        """
+        rel = (rel or "").replace("\\", "/").lstrip("/")
+        path = os.path.normpath(os.path.join(self.root, rel))
+        if not rel or not path.startswith(self.root + os.sep):
+            return ""
+        if sig is None:
+            sig = _stat_sig(path)
+        if sig[2] < 0:
+            return ""
+        cached = self._digests.get(rel)
+        if cached is not None and cached[0] == sig:
+            return cached[1]
+        h = hashlib.md5()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    h.update(chunk)
+        except OSError:
+            return ""
+        digest = h.hexdigest()[: self.length]
+        self._digests[rel] = (sig, digest)
+        return digest
+
+
+# -------------------------
+# Image derivatives (WebP/AVIF for srcset)
+# -------------------------
+# Optional: without Pillow no derivatives are written and templates keep the original <img>.
+try:
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+IMAGE_DERIVATIVE_DIR = "cache/img"  # static-relative; holds the variants and manifest.json
+IMAGE_DERIVATIVE_WIDTHS = (320, 480, 720, 1080)
+IMAGE_DERIVATIVE_EXTS = frozenset({".png", ".jpg", ".jpeg", ".webp", ".jfif"})
+_IMAGE_SAVE_OPTIONS = {
+    "avif": {"quality": 60, "speed": 6},
+    "webp": {"quality": 80, "method": 4},
+}
+_image_manifest_lock = threading.Lock()
+
+
+def image_derivative_formats() -> Tuple[str, ...]:
+    """Formats this Pillow build can encode, preferred (smallest) first."""
+    if PILImage is None:
+        return ()
+    PILImage.init()
+    return tuple(fmt for fmt in ("avif", "webp") if fmt.upper() in PILImage.SAVE)
+
+
+def _write_image_variants(
+    static_dir: str, rel: str, formats: Sequence[str], widths: Sequence[int]
+) -> Dict[str, List[List[Any]]]:
+    """Encode static/<rel> at each width (never upscaled); returns {format: [[width, rel], ...]}."""
+    stem = os.path.splitext(rel)[0]
+    variants: Dict[str, List[List[Any]]] = {fmt: [] for fmt in formats}
+    with PILImage.open(os.path.join(static_dir, rel)) as src:
+        src.load()
+        im = src
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+        src_w, src_h = im.size
+        for w in sorted({min(w, src_w) for w in widths}):
+            resized = im if w == src_w else im.resize((w, max(1, round(src_h * w / src_w))), PILImage.LANCZOS)
+            for fmt in formats:
+                out_rel = f"{IMAGE_DERIVATIVE_DIR}/{stem}-{w}.{fmt}"
+                out_path = os.path.join(static_dir, *out_rel.split("/"))
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                tmp_path = f"{out_path}.tmp"
+                resized.save(tmp_path, format=fmt.upper(), **_IMAGE_SAVE_OPTIONS[fmt])
+                os.replace(tmp_path, out_path)
+                variants[fmt].append([w, out_rel])
+    return variants
+
+
+def build_image_derivatives(
+    static_dir: str,
+    rels: Iterable[str],
+    fingerprints: Optional[StaticFingerprints] = None,
+    widths: Sequence[int] = IMAGE_DERIVATIVE_WIDTHS,
+) -> int:
+    """Write WebP/AVIF variants for static/<rel> images and record them in the manifest.
+
+    Manifest (static/cache/img/manifest.json): {rel: {"hash": content digest, "variants":
+    {format: [[width, rel], ...]}}}. Images whose digest is unchanged are skipped, so reruns
+    only encode new or replaced files. Returns the number of images (re)encoded.
+    """
+    formats = image_derivative_formats()
+    if not formats:
+        return 0
+    fingerprints = fingerprints or StaticFingerprints(static_dir)
+    manifest_path = os.path.join(static_dir, *IMAGE_DERIVATIVE_DIR.split("/"), "manifest.json")
+    with _image_manifest_lock:
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if not isinstance(manifest, dict):
+                manifest = {}
+        except Exception:
+            manifest = {}
+
+        built = 0
+        for rel in rels:
+            rel = (rel or "").replace("\\", "/").lstrip("/")
+            if os.path.splitext(rel)[1].lower() not in IMAGE_DERIVATIVE_EXTS:
+                continue
+            digest = fingerprints.get(rel)
+            if not digest:
+                continue
+            entry = manifest.get(rel) or {}
+            if entry.get("hash") == digest and set(formats) <= set(entry.get("variants") or {}):
+                continue
+            try:
+                variants = _write_image_variants(static_dir, rel, formats, widths)
+            except Exception:
+                continue  # unreadable or unsupported image: keep serving the original
+            manifest[rel] = {"hash": digest, "variants": variants}
+            built += 1
+
+        if built:
+            os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+            tmp_path = manifest_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, manifest_path)
+    return built
+
+
+try:
+    import fcntl  # POSIX: lets gunicorn workers share the single-flight thumbnail lock
+except ImportError:
+    fcntl = None
+
+
+class ThumbnailCache:
+    """On-demand resized images kept on disk, bounded by total size with LRU eviction.
+
+    Files are named after the source path and its (mtime, size), so a replaced source gets a
+    new entry and the old one ages out. Hits refresh the file's atime (mtime stays put, so
+    ETag/Last-Modified are stable), and eviction drops the least recently read files.
+    Concurrent requests for one variant wait on a striped lock (plus an flock on that stripe's
+    lock file across worker processes where available) and the second one finds the finished
+    file. Lock files are permanent: unlinking one would let a waiter hold a lock on a deleted
+    inode while a third process locks a fresh file.
+    """
+
+    def __init__(self, root: str, max_bytes: int, quality: int = 80) -> None:
+        self.root = root
+        self.max_bytes = max(0, int(max_bytes))
+        self.quality = quality
+        self._locks = [threading.Lock() for _ in range(64)]
+        self._size_lock = threading.Lock()
+        self._total: Optional[int] = None  # bytes on disk; scanned lazily on first write
+
+    def path_for(self, src_path: str, width: int, height: int) -> str:
+        st = os.stat(src_path)
+        key = f"{os.path.abspath(src_path)}|{st.st_mtime_ns}|{st.st_size}"
+        name = hashlib.md5(key.encode("utf-8", errors="ignore")).hexdigest()[:24]
+        return os.path.join(self.root, f"{width}x{height}", name[:2], f"{name}.webp")
+
+    def get_or_create(self, src_path: str, width: int, height: int) -> Optional[str]:
+        """Path of the cached WebP (rendered on first use); None if it cannot be produced."""
+        if PILImage is None or "webp" not in image_derivative_formats():
+            return None
+        try:
+            out_path = self.path_for(src_path, width, height)
+        except OSError:
+            return None
+        if self._touch(out_path):
+            return out_path
+
+        # The stripe comes from the file name (an md5), so every worker process agrees on it.
+        stripe = int(os.path.basename(out_path)[:8], 16) % len(self._locks)
+        with self._locks[stripe]:
+            if self._touch(out_path):
+                return out_path
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            lock_file = None
+            try:
+                if fcntl is not None:
+                    lock_dir = os.path.join(self.root, "locks")
+                    os.makedirs(lock_dir, exist_ok=True)
+                    lock_file = open(os.path.join(lock_dir, f"{stripe:02d}.lock"), "a")
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    if self._touch(out_path):
+                        return out_path
+                nbytes = self._render(src_path, out_path, width, height)
+            except Exception:
+                return None
+            finally:
+                if lock_file is not None:
+                    lock_file.close()  # releases the flock; the file stays for the next writer
+        self._account(nbytes, keep=out_path)
+        return out_path
+
+    def _touch(self, path: str) -> bool:
+        try:
+            st = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+            return True
+        except OSError:
+            return False
+
+    def _render(self, src_path: str, out_path: str, width: int, height: int) -> int:
+        with PILImage.open(src_path) as im:
+            im.load()
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+            im.thumbnail((width, height), PILImage.LANCZOS)  # fit inside the box, never upscale
+            tmp_path = f"{out_path}.{uuid.uuid4().hex}.tmp"
+            im.save(tmp_path, format="WEBP", quality=self.quality, method=4)
+        os.replace(tmp_path, out_path)
+        return os.path.getsize(out_path)
+
+    def _account(self, nbytes: int, keep: str = "") -> None:
+        with self._size_lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._entries())
+            else:
+                self._total += nbytes
+            if self._total <= self.max_bytes:
+                return
+            # Trim to 90% so eviction does not run on every subsequent write.
+            target = int(self.max_bytes * 0.9)
+            for path, size, _ in sorted(self._entries(), key=lambda e: e[2]):
+                if self._total <= target:
+                    break
+                if path == keep:
+                    continue  # about to be served
+                try:
+                    os.unlink(path)
+                    self._total -= size
+                except OSError:
+                    pass
+
+    def _entries(self) -> List[Tuple[str, int, int]]:
+        """(path, bytes, atime_ns) of every cached thumbnail."""
+        out: List[Tuple[str, int, int]] = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for fn in filenames:
+                if not fn.endswith(".webp"):
+                    continue
+                full = os.path.join(dirpath, fn)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                out.append((full, st.st_size, st.st_atime_ns))
+        return out
+
+
+# -------------------------
+# Search
+# -------------------------
+# Letters that NFKD does not decompose into base + combining mark.
+_FOLD_EXTRA = str.maketrans({"ł": "l", "Ł": "l", "ø": "o", "đ": "d", "ß": "ss"})
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Light Polish stemming: strip the most common inflectional endings (longest first) as long
+# as a stem of at least 3 letters remains. Query stems are then matched as prefixes, so
+# "zgoda", "zgody" and "zgodą" all meet at "zgod".
+_PL_SUFFIXES = tuple(sorted(
+    (
+        "ami", "ach", "owi", "ego", "emu", "ych", "ymi", "ich", "imi", "owa", "owe", "owy",
+        "om", "ow", "em", "ie", "ia", "ii", "ej", "ym", "im",
+        "a", "e", "i", "o", "u", "y",
+    ),
+    key=len,
+    reverse=True,
+))
+
+
+@lru_cache(maxsize=16384)
+def fold_text(text: str) -> str:
+    """Lowercase and strip diacritics (zgodą -> zgoda, łódź -> lodz)."""
+    norm = unicodedata.normalize("NFKD", (text or "").translate(_FOLD_EXTRA).lower())
+    return "".join(ch for ch in norm if unicodedata.category(ch) != "Mn")
+
+
+def search_tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+@lru_cache(maxsize=16384)
+def stem_pl(token: str) -> str:
+    for suf in _PL_SUFFIXES:
+        if token.endswith(suf) and len(token) - len(suf) >= 3:
+            return token[: -len(suf)]
+    return token
+
+
+class SearchIndex:
+    """Inverted index over folded title / category / description tokens of one catalog.
+
+    Every query token must match (AND); a token matches index terms that start with its stem
+    and, once the stem has 3+ letters, also terms that contain it, as the old substring filter
+    did ("terapia" -> "fizjoterapia"). Infix candidates come from the terms' trigrams and are
+    confirmed with a substring test.
+    Score = sum over query tokens of the best field weight they hit, exact terms counting
+    double and infix-only terms half.
+    """
+
+    FIELD_WEIGHTS = (("title", 3), ("category", 2), ("description", 1))
+    INFIX_MIN = 3
+
+    def __init__(self, products: Iterable[Product]) -> None:
+        postings: Dict[str, Dict[int, int]] = {}
+        for pos, p in enumerate(products):
+            for term, weight in self._doc_terms(p).items():
+                postings.setdefault(term, {})[pos] = weight
+        self.postings = postings
+        self.terms = sorted(postings)
+        # Unpadded trigram -> terms containing it (for infix lookups).
+        self._infix: Dict[str, List[str]] = {}
+        for term in self.terms:
+            for g in self._term_grams(term):
+                self._infix.setdefault(g, []).append(term)
+
+    @classmethod
+    def _doc_terms(cls, p: Product) -> Dict[str, int]:
+        """Term -> best field weight of one product."""
+        out: Dict[str, int] = {}
+        for fname, weight in cls.FIELD_WEIGHTS:
+            for term in search_tokens(getattr(p, fname, "") or ""):
+                if out.get(term, 0) < weight:
+                    out[term] = weight
+        return out
+
+    @staticmethod
+    def _term_grams(term: str) -> set[str]:
+        return {term[j : j + 3] for j in range(len(term) - 2)}
+
+    def patched(self, changes: Iterable[Tuple[int, Product, Product]]) -> "SearchIndex":
+        """Copy of this index with products replaced in place: (position, old, new) triples.
+
+        Only the postings, terms and trigram lists those products touch are copied and edited;
+        everything else is shared with this (still live) index.
+        """
+        touched: Dict[str, Dict[int, int]] = {}
+        for pos, old, new in changes:
+            for term in self._doc_terms(old):
+                touched.setdefault(term, dict(self.postings.get(term, {}))).pop(pos, None)
+            for term, weight in self._doc_terms(new).items():
+                touched.setdefault(term, dict(self.postings.get(term, {})))[pos] = weight
+
+        out = copy.copy(self)
+        out.postings = dict(self.postings)
+        added = [t for t, docs in touched.items() if docs and t not in self.postings]
+        removed = [t for t, docs in touched.items() if not docs and t in self.postings]
+        for term, docs in touched.items():
+            if docs:
+                out.postings[term] = docs
+            else:
+                out.postings.pop(term, None)
+        if added or removed:
+            out.terms = list(self.terms)
+            out._infix = dict(self._infix)
+            for term in removed:
+                del out.terms[bisect.bisect_left(out.terms, term)]
+                for g in self._term_grams(term):
+                    out._infix[g] = [t for t in out._infix[g] if t != term]
+            for term in added:
+                bisect.insort(out.terms, term)
+                for g in self._term_grams(term):
+                    out._infix[g] = out._infix.get(g, []) + [term]
+        return out
+
+    def _expand(self, token: str) -> List[str]:
+        stem = stem_pl(token)
+        i = bisect.bisect_left(self.terms, stem)
+        out: List[str] = []
+        while i < len(self.terms) and self.terms[i].startswith(stem):
+            out.append(self.terms[i])
+            i += 1
+        return out
+
+    def _expand_infix(self, token: str) -> List[Tuple[str, float]]:
+        """Terms containing the token's stem, as (term, score factor); prefix-only for short stems."""
+        stem = stem_pl(token)
+        if len(stem) < self.INFIX_MIN:
+            return [(term, 2.0 if term == token else 1.0) for term in self._expand(token)]
+        lists = sorted((self._infix.get(stem[j : j + 3], ()) for j in range(len(stem) - 2)), key=len)
+        # A containing term has every trigram of the stem: scan the rarest list, test the rest.
+        out: List[Tuple[str, float]] = []
+        for term in lists[0]:
+            if term == token:
+                out.append((term, 2.0))
+            elif term.startswith(stem):
+                out.append((term, 1.0))
+            elif stem in term:
+                out.append((term, 0.5))
+        return out
+
+    def search(self, query: str, fuzzy: Optional[TrigramIndex] = None) -> Dict[int, float]:
+        """Catalog positions matching every token of `query`, mapped to their score.
+
+        fuzzy: tokens without any exact/prefix/infix match fall back to similar vocabulary
+        words (score scaled by similarity).
+        """
+        tokens = list(dict.fromkeys(search_tokens(query)))
+        if not tokens:
+            return {}
+        scores: Optional[Dict[int, float]] = None
+        for tok in tokens:
+            terms = self._expand_infix(tok)
+            if not terms and fuzzy is not None:
+                terms = [(term, sim) for term, sim in fuzzy.similar(tok) if term in self.postings]
+            hits: Dict[int, float] = {}
+            for term, factor in terms:
+                for pos, weight in self.postings[term].items():
+                    s = weight * factor
+                    if hits.get(pos, 0) < s:
+                        hits[pos] = s
+            if scores is None:
+                scores = hits
+            else:
+                scores = {pos: scores[pos] + s for pos, s in hits.items() if pos in scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+
+class TrigramIndex:
+    """Typo-tolerant word lookup over the folded title and category vocabulary.
+
+    A word is matched to vocabulary words by the Dice coefficient of their padded trigram
+    sets. Candidates are gathered from the query's posting lists rarest first, reading at
+    most SCAN_BUDGET postings in total (common trigrams are cut short or skipped), and only
+    the MAX_CANDIDATES words sharing the most scanned trigrams are scored exactly. Both
+    steps are capped, so the work per query word stays bounded as the vocabulary grows.
+
+    Words carry occurrence counts so a patched index (see patched) can drop a word that no
+    product uses any more without renumbering: it stays in the lists but is never returned.
+    """
+
+    SCAN_BUDGET = 4000
+    MAX_CANDIDATES = 200
+    THRESHOLD = 0.45
+    MAX_WORD = 32
+
+    def __init__(self, words: Iterable[str]) -> None:
+        self._refs: Counter = Counter(w for w in words if len(w) >= 3)
+        self.words = sorted(self._refs)
+        self._ids: Dict[str, int] = {}
+        self._sizes: List[int] = []
+        self._grams: Dict[str, List[int]] = {}
+        for w in self.words:
+            self._add_word(w, self._grams)
+
+    def _add_word(self, w: str, grams_map: Dict[str, List[int]]) -> None:
+        i = len(self._sizes)
+        self._ids[w] = i
+        grams = self._trigrams(w)
+        self._sizes.append(len(grams))
+        for g in grams:
+            grams_map.setdefault(g, []).append(i)
+
+    def patched(self, removed: Iterable[str], added: Iterable[str]) -> "TrigramIndex":
+        """Copy with word occurrences removed/added; new words are appended, not re-sorted."""
+        out = copy.copy(self)
+        out._refs = self._refs.copy()
+        out._refs.subtract(w for w in removed if len(w) >= 3)
+        new_words = []
+        for w in added:
+            if len(w) >= 3:
+                if w not in self._ids and out._refs[w] <= 0:
+                    new_words.append(w)
+                out._refs[w] += 1
+        if new_words:
+            out.words = self.words + new_words
+            out._ids = dict(self._ids)
+            out._sizes = list(self._sizes)
+            out._grams = dict(self._grams)
+            for w in new_words:
+                # Copy each touched posting list once; the originals stay with this index.
+                for g in self._trigrams(w):
+                    if out._grams.get(g) is self._grams.get(g):
+                        out._grams[g] = list(self._grams.get(g, ()))
+                out._add_word(w, out._grams)
+        return out
+
+    @staticmethod
+    def _trigrams(word: str) -> set[str]:
+        padded = f"  {word} "
+        return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+    def similar(self, word: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """Up to `limit` vocabulary words similar to `word`, best first, as (word, similarity)."""
+        word = (word or "")[: self.MAX_WORD]
+        if len(word) < 3:
+            return []
+        grams = self._trigrams(word)
+        shared: Counter = Counter()
+        budget = self.SCAN_BUDGET
+        for postings in sorted((self._grams.get(g, ()) for g in grams), key=len):
+            if budget <= 0:
+                break
+            shared.update(postings[:budget])
+            budget -= len(postings)
+        out: List[Tuple[str, float]] = []
+        for i, _ in shared.most_common(self.MAX_CANDIDATES):
+            if self._refs[self.words[i]] <= 0:
+                continue  # no longer used by any product (patched index)
+            # Exact overlap: the scan above may have cut some of this word's shared trigrams.
+            n = len(grams & self._trigrams(self.words[i]))
+            sim = 2.0 * n / (len(grams) + self._sizes[i])
+            if sim >= self.THRESHOLD:
+                out.append((self.words[i], sim))
+        out.sort(key=lambda x: (-x[1], x[0]))
+        return out[:limit]
+
+
+class SuggestIndex:
+    """Edge-n-gram index for the type-ahead (/api/search_suggest).
+
+    Only titles and category names are indexed, so lookups do not depend on description size.
+    Each query token must be a prefix of some title/category token; results rank title hits
+    before category-only hits, then by the position of the matching word, then by title.
+    """
+
+    MAX_GRAM = 16
+
+    def __init__(self, products: Iterable[Product]) -> None:
+        self.products: List[Product] = []
+        self._doc_tokens: List[Tuple[List[str], List[str]]] = []
+        self._grams: Dict[str, Dict[int, Tuple[int, int]]] = {}
+        counts: Dict[str, int] = {}
+
+        self._slots: Dict[str, int] = {}   # product id -> index into self.products
+        for p in products:
+            # Navigation-only category cards are not suggested as products.
+            if p.is_category_card() or p.id.startswith("dbcat:"):
+                continue
+            i = len(self.products)
+            self.products.append(p)
+            self._slots.setdefault(p.id, i)
+            counts[p.category] = counts.get(p.category, 0) + 1
+
+            doc_tokens = (search_tokens(p.title), search_tokens(p.category))
+            self._doc_tokens.append(doc_tokens)
+            for gram, hit in self._doc_hits(doc_tokens).items():
+                self._grams.setdefault(gram, {})[i] = hit
+        self._title_keys = [fold_text(p.title) for p in self.products]
+
+        # Category suggestions: precomputed counts, alphabetical, with their own gram map.
+        self.categories: List[Tuple[str, int]] = sorted(counts.items(), key=lambda x: x[0].lower())
+        self._cat_tokens: List[List[str]] = [search_tokens(name) for name, _ in self.categories]
+        self._cat_grams: Dict[str, set[int]] = {}
+        for ci, tokens in enumerate(self._cat_tokens):
+            for tok in tokens:
+                for n in range(1, min(len(tok), self.MAX_GRAM) + 1):
+                    self._cat_grams.setdefault(tok[:n], set()).add(ci)
+
+    @classmethod
+    def _doc_hits(cls, doc_tokens: Tuple[List[str], List[str]]) -> Dict[str, Tuple[int, int]]:
+        """Edge n-gram -> best (field rank, token position) of one product."""
+        out: Dict[str, Tuple[int, int]] = {}
+        for field_rank, tokens in enumerate(doc_tokens):
+            for tpos, tok in enumerate(tokens):
+                hit = (field_rank, tpos)
+                for n in range(1, min(len(tok), cls.MAX_GRAM) + 1):
+                    if tok[:n] not in out or hit < out[tok[:n]]:
+                        out[tok[:n]] = hit
+        return out
+
+    def patched(self, changes: Iterable[Tuple[Product, Product]]) -> Optional["SuggestIndex"]:
+        """Copy with (old, new) products swapped in place; None if one is not indexed here.
+
+        Category names and counts are left as they are: callers only patch changes that
+        keep every product's category.
+        """
+        out = copy.copy(self)
+        out.products = list(self.products)
+        out._doc_tokens = list(self._doc_tokens)
+        out._title_keys = list(self._title_keys)
+        out._grams = dict(self._grams)
+        copied: set[str] = set()
+        for old, new in changes:
+            i = self._slots.get(old.id)
+            if i is None or self.products[i] is not old:
+                if old.is_category_card() or old.id.startswith("dbcat:"):
+                    continue  # not suggested
+                return None
+            doc_tokens = (search_tokens(new.title), search_tokens(new.category))
+            old_hits, new_hits = self._doc_hits(out._doc_tokens[i]), self._doc_hits(doc_tokens)
+            for gram in old_hits.keys() | new_hits.keys():
+                if gram not in copied:
+                    out._grams[gram] = dict(self._grams.get(gram, {}))
+                    copied.add(gram)
+                if gram in new_hits:
+                    out._grams[gram][i] = new_hits[gram]
+                else:
+                    out._grams[gram].pop(i, None)
+            out.products[i] = new
+            out._doc_tokens[i] = doc_tokens
+            out._title_keys[i] = fold_text(new.title)
+        for gram in copied:
+            if not out._grams[gram]:
+                del out._grams[gram]
+        return out
+
+    def _token_hits(self, tok: str, fuzzy: Optional[TrigramIndex] = None) -> Dict[int, Tuple[int, int]]:
+        docs = self._grams.get(tok[: self.MAX_GRAM], {})
+        if not docs and fuzzy is not None:
+            out: Dict[int, Tuple[int, int]] = {}
+            for word, _ in fuzzy.similar(tok):
+                for i, hit in self._token_hits(word).items():
+                    if i not in out or hit < out[i]:
+                        out[i] = hit
+            return out
+        if len(tok) <= self.MAX_GRAM:
+            return docs
+        # Longer than the indexed grams: confirm against the document tokens.
+        out: Dict[int, Tuple[int, int]] = {}
+        for i in docs:
+            for field_rank, tokens in enumerate(self._doc_tokens[i]):
+                tpos = next((k for k, t in enumerate(tokens) if t.startswith(tok)), None)
+                if tpos is not None:
+                    out[i] = (field_rank, tpos)
+                    break
+        return out
+
+    def suggest_products(self, query: str, limit: int = 8, fuzzy: Optional[TrigramIndex] = None) -> List[Product]:
+        tokens = list(dict.fromkeys(search_tokens(query)))
+        if not tokens:
+            return []
+        ranked: Optional[Dict[int, Tuple[int, int]]] = None
+        for tok in tokens:
+            hits = self._token_hits(tok, fuzzy)
+            if ranked is None:
+                ranked = dict(hits)
+            else:
+                ranked = {i: max(ranked[i], h) for i, h in hits.items() if i in ranked}
+            if not ranked:
+                return []
+        best = sorted(ranked or {}, key=lambda i: (ranked[i], self._title_keys[i]))[:limit]
+        return [self.products[i] for i in best]
+
+    def _cat_hits(self, tok: str) -> set[int]:
+        hits = self._cat_grams.get(tok[: self.MAX_GRAM], set())
+        if len(tok) > self.MAX_GRAM:
+            hits = {ci for ci in hits if any(t.startswith(tok) for t in self._cat_tokens[ci])}
+        return hits
+
+    def suggest_categories(self, query: str, limit: int = 6, fuzzy: Optional[TrigramIndex] = None) -> List[Tuple[str, int]]:
+        tokens = list(dict.fromkeys(search_tokens(query)))
+        if not tokens:
+            return []
+        found: Optional[set[int]] = None
+        for tok in tokens:
+            hits = self._cat_hits(tok)
+            if not hits and fuzzy is not None:
+                hits = set().union(*(self._cat_hits(word) for word, _ in fuzzy.similar(tok)))
+            found = hits if found is None else found & hits
+            if not found:
+                return []
+        return [self.categories[ci] for ci in sorted(found or ())][:limit]
+
+
+# -------------------------
+# Facets
+# -------------------------
+class FacetIndex:
+    """Precomputed facet bitsets over catalog positions (bit i = snapshot.products[i]).
+
+    Counts for any result set are popcounts of `facet bits & result mask`, so sidebar counts
+    and format/price filters never rescan the catalog. Category cards carry no facets.
+    """
+
+    def __init__(self, products: Iterable[Product], docu_index: Optional[DocuBeautyIndex] = None) -> None:
+        self.ext: Dict[str, int] = {}      # "pdf" -> bits
+        self.price: Dict[int, int] = {}    # price bucket (PLN) -> bits
+        for pos, p in enumerate(products):
+            if p.is_category_card():
+                continue
+            bit = 1 << pos
+            bucket = int(_docubeauty_price_bucket(p.price_pln))
+            self.price[bucket] = self.price.get(bucket, 0) | bit
+            ext = self._product_ext(p, docu_index)
+            if ext:
+                self.ext[ext] = self.ext.get(ext, 0) | bit
+
+    def patched(
+        self, changes: Iterable[Tuple[int, Product, Product]], docu_index: Optional[DocuBeautyIndex] = None
+    ) -> "FacetIndex":
+        """Copy with products replaced in place: (position, old, new); card status must not change."""
+        out = copy.copy(self)
+        out.ext, out.price = dict(self.ext), dict(self.price)
+        for pos, old, new in changes:
+            if old.is_category_card():
+                continue
+            bit = 1 << pos
+            for facet, before, after in (
+                (out.price, int(_docubeauty_price_bucket(old.price_pln)), int(_docubeauty_price_bucket(new.price_pln))),
+                (out.ext, self._product_ext(old, docu_index) or None, self._product_ext(new, docu_index) or None),
+            ):
+                if before == after:
+                    continue
+                if before is not None:
+                    facet[before] = facet.get(before, 0) & ~bit
+                    if not facet[before]:
+                        del facet[before]
+                if after is not None:
+                    facet[after] = facet.get(after, 0) | bit
+        return out
+
+    @staticmethod
+    def _product_ext(p: Product, docu_index: Optional[DocuBeautyIndex]) -> str:
+        ext = ""
+        if p.docu_cat_slug and p.docu_item_id and docu_index is not None:
+            item = docu_index.item(p.docu_cat_slug, p.docu_item_id) or {}
+            ext = str(item.get("ext") or "")
+        elif p.download_file:
+            ext = os.path.splitext(p.download_file)[1]
+        return ext.lower().lstrip(".")
+
+    @staticmethod
+    def mask(positions: Iterable[int]) -> int:
+        bits = 0
+        for pos in positions:
+            bits |= 1 << pos
+        return bits
+
+    @staticmethod
+    def counts(facet: Dict[Any, int], mask: int) -> List[Tuple[Any, int]]:
+        """(value, count) for values present in `mask`, in sorted value order."""
+        out = []
+        for value in sorted(facet):
+            n = (facet[value] & mask).bit_count()
+            if n:
+                out.append((value, n))
+        return out
+
+
+# -------------------------
+# Response caching
+# -------------------------
+class LRUCache:
+    """Small thread-safe LRU map (bounded by entry count)."""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def discard(self, predicate: Callable[[Any, Any], bool]) -> int:
+        """Drop every entry for which predicate(key, value) is true; returns how many went."""
+        with self._lock:
+            doomed = [k for k, v in self._data.items() if predicate(k, v)]
+            for k in doomed:
+                del self._data[k]
+            return len(doomed)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja tag ``{% cache key, ... %}...{% endcache %}`` memoizing rendered fragments.
+
+    Entries are keyed by the tag arguments plus ``environment.fragment_cache_scope()``
+    (the app passes the catalog version), so they go stale with the catalog on their own.
+    Rendered markup lives in ``environment.fragment_cache`` (an LRUCache); None disables it.
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment) -> None:
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_cache_scope=lambda: ())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render", [nodes.Tuple(args, "load")])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, key: tuple, caller: Callable[[], str]) -> str:
+        store = self.environment.fragment_cache
+        if store is None:
+            return caller()
+        key = (self.environment.fragment_cache_scope(), key)
+        rv = store.get(key)
+        if rv is None:
+            rv = caller()
+            store.set(key, rv)
+        return rv
+
+
+# -------------------------
+# Filesystem watcher (catalog refresh)
+# -------------------------
+class _Inotify:
+    """Minimal inotify(7) binding over ctypes (Linux only; no extra dependency)."""
+
+    # IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    MASK = 0x00000008 | 0x00000004 | 0x00000040 | 0x00000080 | 0x00000100 | 0x00000200 | 0x00000400
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self) -> None:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched: set[str] = set()
+
+    def watch(self, path: str) -> None:
+        if path in self._watched or not os.path.isdir(path):
+            return
+        if self._add(self.fd, os.fsencode(path), self.MASK) >= 0:
+            self._watched.add(path)
+
+    def wait(self, timeout: float) -> bool:
+        """Block until at least one event arrives (True) or the timeout expires (False)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        os.read(self.fd, 64 * 1024)  # drain; we only need to know *that* something changed
+        return True
+
+    def forget(self) -> None:
+        # Deleted/recreated folders get a new watch on the next sync.
+        self._watched = {p for p in self._watched if os.path.isdir(p)}
+
+
+class CatalogWatcher:
+    """Background thread that refreshes the catalog snapshot when its inputs change.
+
+    mode:
+      "inotify" – kernel notifications (Linux), falls back to "poll" when unavailable
+      "poll"    – compare the catalog fingerprint every `interval` seconds
+    Changes are debounced so a burst of writes (e.g. unpacking a ZIP) triggers one refresh.
+    """
+
+    def __init__(
+        self,
+        watch_dirs: Callable[[], List[str]],
+        on_change: Callable[[], None],
+        mode: str = "inotify",
+        interval: float = 2.0,
+        debounce: float = 0.25,
+    ) -> None:
+        self.watch_dirs = watch_dirs
+        self.on_change = on_change
+        self.mode = mode
+        self.interval = max(0.2, float(interval))
+        self.debounce = max(0.0, float(debounce))
+        self._thread: Optional[threading.Thread] = None
+
+    def is_active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "CatalogWatcher":
+        if self.is_active():
+            return self
+        inotify: Optional[_Inotify] = None
+        if self.mode == "inotify":
+            try:
+                inotify = _Inotify()
+            except Exception:
+                inotify = None
+            if inotify is None:
+                self.mode = "poll"
+        target = self._run_inotify if inotify is not None else self._run_poll
+        args = (inotify,) if inotify is not None else ()
+        self._thread = threading.Thread(target=target, args=args, name="catalog-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def _refresh(self) -> None:
+        try:
+            self.on_change()
+        except Exception:
+            # Never let a broken file kill the watcher; the next change retries.
+            pass
+
+    def _run_inotify(self, inotify: _Inotify) -> None:
+        while True:
+            for d in self.watch_dirs():
+                inotify.watch(d)
+            if not inotify.wait(self.interval * 30):
+                continue
+            # Debounce: keep draining until the burst settles.
+            while self.debounce and inotify.wait(self.debounce):
+                pass
+            inotify.forget()
+            self._refresh()
+
+    def _run_poll(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self._refresh()
+
 
 # -------------------------
 # App factory
@@ -756,8 +2373,13 @@ def create_app() -> Flask:
             os.path.join(PERSIST_BASE, "digital_goods", "custom_uploads"),
         )
 
-    # Hard disable static caching during development
-    app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 0
+    # Earlier releases kept the ZIP listings under static/, where anyone could fetch them.
+    shutil.rmtree(os.path.join(app.static_folder, "cache", "zip_index"), ignore_errors=True)
+
+    # Files served by send_file (static, media) are cacheable for STATIC_MAX_AGE seconds and
+    # revalidate via ETag/Last-Modified; see apply_cache_policy for the per-route rules.
+    STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE") or 86400)
+    app.config["SEND_FILE_MAX_AGE_DEFAULT"] = STATIC_MAX_AGE
     app.secret_key = os.getenv("SECRET_KEY", "dev-secret-change-me")
 
     # Stripe configuration (test keys; override with env vars in production)
@@ -766,7 +2388,29 @@ def create_app() -> Flask:
         "STRIPE_PUBLISHABLE_KEY", STRIPE_PUBLISHABLE_KEY_DEFAULT
     )
 
-    STATIC_VERSION = str(int(time.time()))
+    # url_for('static', ...) gets ?v=<content hash> unless a v is passed explicitly, so asset
+    # URLs change only when bytes change and can be served immutable (see apply_cache_policy).
+    # File signatures come from the catalog snapshot's AssetManifest, rescanned whenever the
+    # catalog fingerprint moves; only files it does not know (and debug mode, where css/js
+    # are edited in place) pay a stat() per URL.
+    static_fingerprints = StaticFingerprints(app.static_folder)
+
+    def static_digest(rel: str) -> str:
+        if not app.debug:
+            # The request's snapshot when it has one; never a refresh just to build a URL.
+            snap = (g.get("_rc_catalog_snapshot") if has_request_context() else None) or _snapshot_state["current"]
+            sig = snap.assets.static_sigs.get((rel or "").replace("\\", "/").lstrip("/")) if snap and snap.assets else None
+            if sig is not None:
+                return static_fingerprints.get(rel, sig)
+        return static_fingerprints.get(rel)
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint: str, values: Dict[str, Any]) -> None:
+        if endpoint != "static" or "v" in values:
+            return
+        digest = static_digest(values.get("filename") or "")
+        if digest:
+            values["v"] = digest
 
     # Template filters
     app.add_template_filter(format_pln, name="pln")
@@ -882,14 +2526,24 @@ def create_app() -> Flask:
     def read_download_token(token: str) -> Dict[str, str]:
         return _serializer().loads(token, max_age=DOWNLOAD_TTL_SECONDS)
 
+    # Paid sessions are remembered briefly: a resumed or segmented download sends one
+    # request per byte range, and each would otherwise be a Stripe API round trip.
+    PAID_SESSION_TTL = float(os.getenv("PAID_SESSION_TTL") or 300)
+    _paid_sessions = LRUCache(1024)
+
     def verify_paid_checkout_session(session_id: str) -> stripe.checkout.Session:
         """Verify Stripe Checkout session is paid; returns the session object."""
+        cached = _paid_sessions.get(session_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
         try:
             cs = stripe.checkout.Session.retrieve(session_id)
         except Exception:
             abort(400, "Invalid session_id")
         if getattr(cs, "payment_status", None) != "paid":
             abort(403, "Payment not completed")
+        if PAID_SESSION_TTL > 0:
+            _paid_sessions.set(session_id, (time.monotonic() + PAID_SESSION_TTL, cs))
         return cs
 
     def safe_goods_path(relpath: str) -> str:
@@ -933,41 +2587,131 @@ def create_app() -> Flask:
     # -------------------------
     PLACEHOLDER_THUMB = "img/placeholder.svg"
 
-    def thumb_url(p: Product) -> str:
+    # /thumb/<w>x<h>/<cards|uploads|media>/<path>: resized WebP copies, cached on disk.
+    THUMB_SIZES: Dict[str, Tuple[int, int]] = {}
+    for _spec in (os.getenv("THUMB_SIZES") or "96x96,160x160,320x320,480x480,640x640").split(","):
+        _m = re.fullmatch(r"\s*(\d{1,4})x(\d{1,4})\s*", _spec)
+        if _m:
+            THUMB_SIZES[f"{int(_m.group(1))}x{int(_m.group(2))}"] = (int(_m.group(1)), int(_m.group(2)))
+    THUMB_CACHE_DIR = os.path.join(app.static_folder, "cache", "thumbs")
+    thumb_cache = ThumbnailCache(THUMB_CACHE_DIR, int(os.getenv("THUMB_CACHE_MAX_BYTES") or 256 * 1024 * 1024))
+
+    def thumbs_enabled() -> bool:
+        return "webp" in image_derivative_formats()
+
+    def thumb_url(p: Product, size: str = "") -> str:
         """Return a usable thumbnail URL (never empty).
 
-        - If product has an image and it exists on disk, return its URL.
-        - Otherwise, return a built-in placeholder.
-        """
-        thumb = p.primary_image() or ""
-        if thumb:
-            if p.image_source == "media":
-                fs = os.path.join(EXPORT_IMAGES, thumb)
-                if os.path.exists(fs):
-                    return url_for("media", filename=thumb)
-            else:
-                fs = os.path.join(app.static_folder, thumb)
-                if os.path.exists(fs):
-                    return url_for("static", filename=thumb)
-        return url_for("static", filename=PLACEHOLDER_THUMB)
+        - If product has an image and it exists on disk, return its URL
+          (the /thumb variant when `size` is one of THUMB_SIZES and Pillow is available).
+        - Otherwise, return a built-in placeholder.
+        """
+        thumb = p.primary_image() or ""
+        resized = size in THUMB_SIZES and thumbs_enabled()
+        if thumb:
+            # Existence is answered by the snapshot's AssetManifest (no stat() per card).
+            assets = get_catalog_snapshot().assets
+            if p.image_source == "media":
+                if assets is not None:
+                    exists = assets.media_exists(thumb)
+                else:
+                    exists = os.path.exists(os.path.join(EXPORT_IMAGES, thumb))
+                if exists:
+                    if resized:
+                        return url_for("thumb", size=size, filename=f"media/{thumb}")
+                    return url_for("media", filename=thumb)
+            else:
+                if assets is not None:
+                    exists = assets.static_exists(thumb, app.static_folder)
+                else:
+                    exists = os.path.exists(os.path.join(app.static_folder, thumb))
+                if exists:
+                    if resized and thumb.startswith(("cards/", "uploads/")):
+                        return url_for("thumb", size=size, filename=thumb)
+                    return url_for("static", filename=thumb)
+        return url_for("static", filename=PLACEHOLDER_THUMB)
+
+    # expose to templates
+    app.add_template_global(thumb_url, name="thumb_url")
+
+    IMAGE_MANIFEST_PATH = os.path.join(app.static_folder, *IMAGE_DERIVATIVE_DIR.split("/"), "manifest.json")
+
+    def image_sources(rel: str) -> List[Tuple[str, str]]:
+        """(mime type, srcset) pairs of WebP/AVIF variants for static/<rel>, best first.
+
+        Empty when no derivatives exist or they were built from different bytes. The manifest
+        is read with the snapshot's AssetManifest (its file is part of the catalog fingerprint).
+        """
+        rel = (rel or "").replace("\\", "/").lstrip("/")
+        assets = get_catalog_snapshot().assets
+        entry = assets.derivatives.get(rel) if assets is not None else None
+        if not entry or entry.get("hash") != static_digest(rel):
+            return []
+        out: List[Tuple[str, str]] = []
+        for fmt, variants in (entry.get("variants") or {}).items():
+            if variants:
+                srcset = ", ".join(f"{url_for('static', filename=v_rel)} {w}w" for w, v_rel in variants)
+                out.append((f"image/{fmt}", srcset))
+        return out
+
+    app.add_template_global(image_sources, name="image_sources")
+
+    def schedule_image_derivatives(rels: Sequence[str]) -> None:
+        """Encode variants for freshly uploaded images off the request thread."""
+        if not image_derivative_formats():
+            return
+
+        def run() -> None:
+            try:
+                if build_image_derivatives(app.static_folder, rels, static_fingerprints):
+                    invalidate_catalog()  # cached cards/pages pick up the new srcset
+            except Exception:
+                pass
+
+        threading.Thread(target=run, name="image-derivatives", daemon=True).start()
 
-    # expose to templates
-    app.add_template_global(thumb_url, name="thumb_url")
+    # Rendered product cards are cached per (catalog version, script root, card key);
+    # see FragmentCacheExtension. FRAGMENT_CACHE_SIZE=0 renders every card afresh.
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    _fragment_cache_size = int(os.getenv("FRAGMENT_CACHE_SIZE") or 4096)
+    app.jinja_env.fragment_cache = LRUCache(_fragment_cache_size) if _fragment_cache_size > 0 else None
+    app.jinja_env.fragment_cache_scope = lambda: (
+        get_catalog_snapshot().version,
+        request.script_root if has_request_context() else "",
+    )
 
     # -------------------------
     # Data loading
     # -------------------------
+    # Parsed JSON inputs are kept per path and re-read only when the file changes on disk
+    # (all writers replace the file, so inode/mtime/size always move). Rebuilding the catalog
+    # after one override edit therefore re-reads only that file.
+    # Callers must treat the returned object as read-only.
+    _json_sources: Dict[str, Tuple[Tuple[int, int, int], Any]] = {}
+
+    def _load_json(path: str, default):
+        sig = _stat_sig(path)
+        if sig[2] < 0:
+            return default
+        cached = _json_sources.get(path)
+        if cached is not None and cached[0] == sig:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return default
+        except Exception:
+            return default
+        _json_sources[path] = (sig, data)
+        return data
 
     # -------------------------
     # Price overrides (simple JSON {product_id: price})
     # -------------------------
     def load_price_overrides() -> Dict[str, float]:
-        try:
-            with open(PRICE_OVERRIDES_PATH, "r", encoding="utf-8") as f:
-                raw = json.load(f) or {}
-        except FileNotFoundError:
-            return {}
-        except Exception:
+        raw = _load_json(PRICE_OVERRIDES_PATH, {}) or {}
+        if not isinstance(raw, dict):
             return {}
         clean: Dict[str, float] = {}
         for pid, val in raw.items():
@@ -983,39 +2727,17 @@ def create_app() -> Flask:
             with open(tmp_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
             os.replace(tmp_path, PRICE_OVERRIDES_PATH)
+            invalidate_catalog()
         except Exception:
             # Best-effort; ignore disk errors in runtime.
             pass
 
-    def apply_price_overrides(products: List[Product], overrides: Dict[str, float]) -> List[Product]:
-        if not overrides:
-            return products
-        try:
-            from dataclasses import replace as _dc_replace
-        except Exception:
-            _dc_replace = None
-        result: List[Product] = []
-        for p in products:
-            new_price = overrides.get(p.id)
-            if new_price is not None and _dc_replace is not None:
-                try:
-                    result.append(_dc_replace(p, price_pln=float(new_price)))
-                    continue
-                except Exception:
-                    pass
-            result.append(p)
-        return result
-
     # -------------------------
     # Description overrides (simple JSON {product_id: description})
     # -------------------------
     def load_description_overrides() -> Dict[str, str]:
-        try:
-            with open(DESCRIPTION_OVERRIDES_PATH, "r", encoding="utf-8") as f:
-                raw = json.load(f) or {}
-        except FileNotFoundError:
-            return {}
-        except Exception:
+        raw = _load_json(DESCRIPTION_OVERRIDES_PATH, {}) or {}
+        if not isinstance(raw, dict):
             return {}
         clean: Dict[str, str] = {}
         for pid, val in raw.items():
@@ -1034,6 +2756,7 @@ def create_app() -> Flask:
             with open(tmp_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
             os.replace(tmp_path, DESCRIPTION_OVERRIDES_PATH)
+            invalidate_catalog()
         except Exception:
             pass
 
@@ -1041,12 +2764,8 @@ def create_app() -> Flask:
     # Title overrides (simple JSON {product_id: title})
     # -------------------------
     def load_title_overrides() -> Dict[str, str]:
-        try:
-            with open(TITLE_OVERRIDES_PATH, "r", encoding="utf-8") as f:
-                raw = json.load(f) or {}
-        except FileNotFoundError:
-            return {}
-        except Exception:
+        raw = _load_json(TITLE_OVERRIDES_PATH, {}) or {}
+        if not isinstance(raw, dict):
             return {}
         clean: Dict[str, str] = {}
         if isinstance(raw, dict):
@@ -1066,35 +2785,13 @@ def create_app() -> Flask:
             with open(tmp_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
             os.replace(tmp_path, TITLE_OVERRIDES_PATH)
+            invalidate_catalog()
         except Exception:
             pass
 
-    def apply_title_overrides(products: List[Product], overrides: Dict[str, str]) -> List[Product]:
-        if not overrides:
-            return products
-        try:
-            from dataclasses import replace as _dc_replace
-        except Exception:
-            _dc_replace = None
-        result: List[Product] = []
-        for p in products:
-            new_title = overrides.get(p.id)
-            if new_title and _dc_replace is not None:
-                try:
-                    result.append(_dc_replace(p, title=str(new_title)))
-                    continue
-                except Exception:
-                    pass
-            result.append(p)
-        return result
-
     def load_category_overrides() -> Dict[str, str]:
-        try:
-            with open(CATEGORY_OVERRIDES_PATH, "r", encoding="utf-8") as f:
-                raw = json.load(f) or {}
-        except FileNotFoundError:
-            return {}
-        except Exception:
+        raw = _load_json(CATEGORY_OVERRIDES_PATH, {}) or {}
+        if not isinstance(raw, dict):
             return {}
         clean: Dict[str, str] = {}
         if isinstance(raw, dict):
@@ -1112,46 +2809,17 @@ def create_app() -> Flask:
             with open(tmp_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
             os.replace(tmp_path, CATEGORY_OVERRIDES_PATH)
+            invalidate_catalog()
         except Exception:
             pass
 
-    def apply_category_overrides(products: List[Product], overrides: Dict[str, str]) -> List[Product]:
-        if not overrides:
-            return products
-        try:
-            from dataclasses import replace as _dc_replace
-        except Exception:
-            _dc_replace = None
-        if not _dc_replace:
-            return products
-        result: List[Product] = []
-        for p in products:
-            new_category = overrides.get(p.id)
-            if new_category is not None:
-                try:
-                    result.append(_dc_replace(p, category=str(new_category)))
-                    continue
-                except Exception:
-                    pass
-            result.append(p)
-        return result
-
-
-    def _load_json(path: str, default):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
-        except Exception:
-            return default
-
     def _save_json(path: str, data) -> None:
         tmp_path = path + ".tmp"
         try:
             with open(tmp_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
             os.replace(tmp_path, path)
+            invalidate_catalog()
         except Exception:
             pass
 
@@ -1217,45 +2885,15 @@ def create_app() -> Flask:
     def save_photo_overrides(items: Dict[str, str]) -> None:
         _save_json(PHOTO_OVERRIDES_PATH, items)
 
-    def apply_photo_overrides(products: List[Product], overrides: Dict[str, str]) -> List[Product]:
-        if not overrides:
-            return products
-        try:
-            from dataclasses import replace as _dc_replace
-        except Exception:
-            _dc_replace = None
-        if not _dc_replace:
-            return products
-        out: List[Product] = []
-        for p in products:
-            rel = overrides.get(p.id)
-            if rel:
-                try:
-                    out.append(_dc_replace(p, images=(rel,), image_source="static"))
-                    continue
-                except Exception:
-                    pass
-            out.append(p)
-        return out
-
-    def apply_deleted_products(products: List[Product], deleted: set[str]) -> List[Product]:
-        if not deleted:
-            return products
-        return [p for p in products if str(p.id) not in deleted]
-
     def load_custom_products() -> List[Product]:
         # One-time best-effort migration: move downloadable files out of /static/uploads
         # into DIGITAL_GOODS_DIR/custom_uploads so they can't be downloaded without payment.
         def _migrate_if_needed() -> None:
-            try:
-                with open(CUSTOM_PRODUCTS_PATH, "r", encoding="utf-8") as f:
-                    raw_local = json.load(f) or []
-            except FileNotFoundError:
-                return
-            except Exception:
-                return
+            raw_local = _load_json(CUSTOM_PRODUCTS_PATH, []) or []
             if not isinstance(raw_local, list):
                 return
+            # Records are edited below; never touch the shared cached copy.
+            raw_local = [dict(rec) if isinstance(rec, dict) else rec for rec in raw_local]
 
             changed = False
 
@@ -1304,13 +2942,7 @@ def create_app() -> Flask:
 
         _migrate_if_needed()
 
-        try:
-            with open(CUSTOM_PRODUCTS_PATH, "r", encoding="utf-8") as f:
-                raw = json.load(f) or []
-        except FileNotFoundError:
-            return []
-        except Exception:
-            return []
+        raw = _load_json(CUSTOM_PRODUCTS_PATH, []) or []
 
         items: List[Product] = []
         if not isinstance(raw, list):
@@ -1366,6 +2998,7 @@ def create_app() -> Flask:
         custom_products: List[Product],
         blocked_slugs: Optional[set[str]] = None,
         blocked_names: Optional[set[str]] = None,
+        assets: Optional[AssetManifest] = None,
     ) -> List[Product]:
         """Build navigation-only cards for custom categories.
 
@@ -1437,8 +3070,11 @@ def create_app() -> Flask:
                 # Prefer an independent static category card image if present.
                 # This prevents the category thumbnail from "following" the newest/first product image.
                 card_rel = f"cards/{slug}.png"
-                card_abs = os.path.join(app.static_folder, card_rel.replace("/", os.sep))
-                if os.path.exists(card_abs):
+                if assets is not None:
+                    card_exists = assets.static_exists(card_rel, app.static_folder)
+                else:
+                    card_exists = os.path.exists(os.path.join(app.static_folder, card_rel.replace("/", os.sep)))
+                if card_exists:
                     default_img = card_rel
                     img_source = "static"
                 else:
@@ -1537,6 +3173,7 @@ def create_app() -> Flask:
         with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(raw, f, ensure_ascii=False, indent=2)
         os.replace(tmp_path, CUSTOM_PRODUCTS_PATH)
+        invalidate_catalog()
 
     def append_custom_product(record: Dict[str, Any]) -> None:
         try:
@@ -1552,58 +3189,98 @@ def create_app() -> Flask:
         save_custom_products(existing)
 
 
-    def apply_description_overrides(products: List[Product], overrides: Dict[str, str]) -> List[Product]:
-        if not overrides and all((p.description or "") for p in products):
-            # Nothing to change
-            return products
-        try:
-            from dataclasses import replace as _dc_replace
-        except Exception:
-            _dc_replace = None
+    # -------------------------
+    # Override overlay
+    # -------------------------
+    # All admin overrides (title, price, description, category, photo, deletions) are merged
+    # into one patch record per product id, and each product is materialised at most once.
+    # Semantics match the former chain of apply_* passes, in this order:
+    # title -> price -> description (falls back to the overridden title) -> category -> photo,
+    # then deleted products are dropped.
+    def load_override_overlay() -> Dict[str, Dict[str, Any]]:
+        overlay: Dict[str, Dict[str, Any]] = {}
+
+        for pid, title in load_title_overrides().items():
+            if title:
+                overlay.setdefault(pid, {})["title"] = str(title)
+        for pid, price in load_price_overrides().items():
+            if price is None:
+                continue
+            try:
+                overlay.setdefault(pid, {})["price_pln"] = float(price)
+            except Exception:
+                continue
+        for pid, desc in load_description_overrides().items():
+            desc = desc if isinstance(desc, str) else str(desc)
+            if desc.strip():
+                overlay.setdefault(pid, {})["description"] = desc.strip()
+        for pid, category in load_category_overrides().items():
+            if category is not None:
+                overlay.setdefault(pid, {})["category"] = str(category)
+        for pid, rel in load_photo_overrides().items():
+            if rel:
+                overlay.setdefault(pid, {}).update(images=(rel,), image_source="static")
+        return overlay
+
+    def apply_override_overlay(
+        products: List[Product],
+        overlay: Dict[str, Dict[str, Any]],
+        deleted: Optional[set[str]] = None,
+        fill_descriptions: bool = True,
+    ) -> List[Product]:
+        """Materialise overridden products in one pass.
+
+        fill_descriptions: products without any description show their (final) title instead.
+        """
         result: List[Product] = []
         for p in products:
-            base_desc = (p.description or "").strip()
-            override_val = overrides.get(p.id)
-            override_val = override_val if override_val is None or isinstance(override_val, str) else str(override_val)
-            final_desc = None
-            if override_val is not None and override_val.strip():
-                final_desc = override_val.strip()
-            elif base_desc:
-                final_desc = base_desc
-            else:
-                # fallback: use product title when nothing else is defined
-                final_desc = p.title
-            if final_desc == base_desc or _dc_replace is None:
-                # keep original if unchanged or cannot replace
-                if not base_desc and final_desc and final_desc != base_desc and _dc_replace is not None:
-                    try:
-                        result.append(_dc_replace(p, description=final_desc))
-                        continue
-                    except Exception:
-                        pass
-                result.append(p)
+            if deleted and str(p.id) in deleted:
+                continue
+            patch = overlay.get(p.id)
+            changes: Dict[str, Any] = dict(patch) if patch else {}
+
+            if fill_descriptions:
+                base_desc = (p.description or "").strip()
+                final_desc = changes.get("description") or base_desc or changes.get("title", p.title)
+                if final_desc == base_desc:
+                    changes.pop("description", None)
+                else:
+                    changes["description"] = final_desc
             else:
+                changes.pop("description", None)
+
+            if changes:
                 try:
-                    result.append(_dc_replace(p, description=final_desc))
+                    p = replace(p, **changes)
                 except Exception:
-                    result.append(p)
+                    pass
+            result.append(p)
         return result
 
-
-
-
-    def load_products() -> List[Product]:
+    # DocuBeauty products are a pure function of the index, and get_docubeauty_index() returns
+    # the same object while the DocuBeauty sources are unchanged: an edit that only touches the
+    # override/custom files then reuses the previous build instead of redoing it.
+    _docu_products_memo: Dict[str, Any] = {"index": None, "products": ()}
+
+    def docubeauty_products_for(docu_index: Optional[DocuBeautyIndex]) -> List[Product]:
+        if docu_index is None:
+            return build_docubeauty_products(app.root_path)
+        if _docu_products_memo["index"] is not docu_index:
+            _docu_products_memo["products"] = tuple(build_docubeauty_products(app.root_path, docu_index))
+            _docu_products_memo["index"] = docu_index
+        return list(_docu_products_memo["products"])
+
+    def load_products(
+        docu_index: Optional[DocuBeautyIndex] = None,
+        assets: Optional[AssetManifest] = None,
+    ) -> List[Product]:
         items: List[Product] = []
 
-        price_overrides = load_price_overrides()
-        desc_overrides = load_description_overrides()
-        title_overrides = load_title_overrides()
-        category_overrides = load_category_overrides()
-        photo_overrides = load_photo_overrides()
+        overlay = load_override_overlay()
         deleted_ids = load_deleted_products()
 
         # Prefer DocuBeauty catalog if available
-        docu_products = build_docubeauty_products(app.root_path)
+        docu_products = docubeauty_products_for(docu_index)
         if docu_products:
             custom_prods = list(load_custom_products())
 
@@ -1617,7 +3294,12 @@ def create_app() -> Flask:
             # Apply photo overrides to a temporary copy of custom products so category thumbnails can
             # pick up the latest overridden images. We still apply overrides to the final combined
             # items list further below (idempotent).
-            custom_prods_for_cards = apply_photo_overrides(list(custom_prods), photo_overrides)
+            photo_overlay = {
+                pid: {k: patch[k] for k in ("images", "image_source")}
+                for pid, patch in overlay.items()
+                if "images" in patch
+            }
+            custom_prods_for_cards = apply_override_overlay(custom_prods, photo_overlay, fill_descriptions=False)
             # Add navigation cards for custom categories (click -> /shop?category=...)
             # so new categories behave like the built-in DocuBeauty packages.
             # IMPORTANT: do not create a duplicate custom category card if a DocuBeauty
@@ -1637,11 +3319,6 @@ def create_app() -> Flask:
                 This function keeps a single card per category title-slug and, when needed, transfers
                 the best thumbnail from the discarded card to the kept one.
                 """
-                try:
-                    from dataclasses import replace as _dc_replace
-                except Exception:
-                    _dc_replace = None
-
                 def _is_cat_card(p: Product) -> bool:
                     return bool((p.docu_cat_slug and not p.docu_item_id) or str(p.id).startswith("cat:"))
 
@@ -1651,7 +3328,7 @@ def create_app() -> Flask:
                 for p in all_items:
                     if not _is_cat_card(p):
                         continue
-                    key = slugify(str(p.title or ""))
+                    key = p.title_slug
                     if not key:
                         continue
                     prev = winners.get(key)
@@ -1680,11 +3357,11 @@ def create_app() -> Flask:
                         and not drop_img.endswith("cards/_placeholder.png")
                     )
 
-                    if _dc_replace is not None and drop_img and (
+                    if drop_img and (
                         prefer_drop or (not keep_img or keep_img.endswith("cards/_placeholder.png"))
                     ):
                         try:
-                            keep = _dc_replace(
+                            keep = replace(
                                 keep,
                                 images=(drop_img,),
                                 image_source=getattr(drop, "image_source", "static") or "static",
@@ -1704,7 +3381,7 @@ def create_app() -> Flask:
                         continue
                     # If this is a category card and we updated the winner instance, replace it.
                     if _is_cat_card(p):
-                        key = slugify(str(p.title or ""))
+                        key = p.title_slug
                         w = winners.get(key)
                         if w and str(w.id) == str(p.id) and w is not p:
                             out.append(w)
@@ -1722,24 +3399,17 @@ def create_app() -> Flask:
                 return final
 
 
-            custom_cat_cards = build_custom_category_cards(custom_prods_for_cards, blocked_slugs=docu_slugs, blocked_names=docu_names)
+            custom_cat_cards = build_custom_category_cards(
+                custom_prods_for_cards, blocked_slugs=docu_slugs, blocked_names=docu_names, assets=assets
+            )
             items = list(docu_products) + custom_cat_cards + custom_prods
-            items = apply_title_overrides(items, title_overrides)
-            items = apply_price_overrides(items, price_overrides)
-            items = apply_description_overrides(items, desc_overrides)
-            items = apply_category_overrides(items, category_overrides)
-            items = apply_photo_overrides(items, photo_overrides)
-            items = apply_deleted_products(items, deleted_ids)
+            items = apply_override_overlay(items, overlay, deleted_ids)
             items = dedupe_category_cards(items)
             return items
 
         # Export from parser (1cart)
         if os.path.exists(EXPORT_PRODUCTS):
-            try:
-                with open(EXPORT_PRODUCTS, "r", encoding="utf-8") as f:
-                    raw = json.load(f)
-            except Exception:
-                raw = []
+            raw = _load_json(EXPORT_PRODUCTS, [])
 
             if isinstance(raw, list):
                 for x in raw:
@@ -1784,11 +3454,7 @@ def create_app() -> Flask:
 
         # Fallback demo
         if not items and os.path.exists(FALLBACK_PRODUCTS):
-            try:
-                with open(FALLBACK_PRODUCTS, "r", encoding="utf-8") as f:
-                    raw = json.load(f)
-            except Exception:
-                raw = []
+            raw = _load_json(FALLBACK_PRODUCTS, [])
 
             if isinstance(raw, list):
                 for x in raw:
@@ -1821,16 +3487,156 @@ def create_app() -> Flask:
         # Always include custom products
         items.extend(load_custom_products())
 
-        items = apply_title_overrides(items, title_overrides)
-        items = apply_price_overrides(items, price_overrides)
-        items = apply_description_overrides(items, desc_overrides)
-        items = apply_category_overrides(items, category_overrides)
-        items = apply_photo_overrides(items, photo_overrides)
-        items = apply_deleted_products(items, deleted_ids)
-        return items
+        return apply_override_overlay(items, overlay, deleted_ids)
+
+    # -------------------------
+    # Catalog snapshot
+    # -------------------------
+    # Building the catalog walks DOCUBEAUTY_PRODUCTS_ROOT, opens every category ZIP and
+    # re-reads all override files. The result only depends on those inputs, so we keep one
+    # process-wide snapshot and rebuild it only when a cheap stat()-based fingerprint changes.
+    # Rebuilds are incremental: unchanged categories come from the previous DocuBeautyIndex
+    # and unchanged JSON files from _load_json, so only the changed input is re-read.
+    #
+    # Two ways of noticing changes:
+    # - default: every request compares the fingerprint (a few dozen stat() calls)
+    # - CATALOG_WATCH=1 (inotify, polling fallback) or CATALOG_WATCH=poll: a background
+    #   CatalogWatcher swaps in a fresh snapshot and requests skip the fingerprint entirely.
+    #   CATALOG_WATCH_INTERVAL sets the polling period in seconds (default 2).
+    _snapshot_lock = threading.Lock()
+    _snapshot_state: Dict[str, Any] = {"current": None, "dirty": False}
+
+    def catalog_fingerprint() -> Tuple[Tuple[Any, ...], Tuple[Any, ...]]:
+        """Fingerprint of every catalog input, built from stat() calls only (no file reads).
+
+        Returns (docubeauty part, data part):
+        - DocuBeauty sources and previews (see docubeauty_fingerprint)
+        - data/*.json (overrides, custom products, deletions) and export_all/products.json
+        - the image roots scanned into AssetManifest (directory entries only)
+        """
+        parts: List[Tuple[str, Tuple[int, int, int]]] = []
+
+        data_dir = os.path.dirname(PRICE_OVERRIDES_PATH)
+        try:
+            data_files = sorted(fn for fn in os.listdir(data_dir) if fn.lower().endswith(".json"))
+        except OSError:
+            data_files = []
+        for fn in data_files:
+            full = os.path.join(data_dir, fn)
+            parts.append((full, _stat_sig(full)))
+
+        parts.append((EXPORT_PRODUCTS, _stat_sig(EXPORT_PRODUCTS)))
+        # Every directory level, not just the roots: the scraper writes images into
+        # export_all/images/<cat_slug>/ and card previews live under cards/items/<slug>/.
+        for d in (os.path.join(app.static_folder, "cards"), UPLOADS_DIR, EXPORT_IMAGES):
+            parts.extend(_source_sig_parts(d))
+        # Rendered cards embed the derivative srcset, so a new manifest is a new catalog version.
+        parts.append((IMAGE_MANIFEST_PATH, _stat_sig(IMAGE_MANIFEST_PATH)))
+        return docubeauty_fingerprint(app.root_path), tuple(parts)
+
+    def asset_sig_parts(fp: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        """The part of a catalog fingerprint that AssetManifest.scan depends on."""
+        roots = (app.static_folder + os.sep, EXPORT_IMAGES)
+        return tuple(part for part in fp[1] if str(part[0]).startswith(roots))
+
+    def catalog_watch_dirs() -> List[str]:
+        dirs: List[str] = []
+        root = DOCUBEAUTY_PRODUCTS_ROOT
+        if root and os.path.isdir(root):
+            for r, subdirs, _ in os.walk(root):
+                dirs.append(r)
+        dirs.append(os.path.dirname(PRICE_OVERRIDES_PATH))
+        dirs.append(EXPORT_DIR)
+        for image_root in (EXPORT_IMAGES, UPLOADS_DIR, os.path.join(app.static_folder, "cards")):
+            dirs.append(image_root)
+            for r, subdirs, _ in os.walk(image_root):
+                if r != image_root:
+                    dirs.append(r)
+        if os.path.isdir(os.path.dirname(IMAGE_MANIFEST_PATH)):
+            dirs.append(os.path.dirname(IMAGE_MANIFEST_PATH))
+        return dirs
+
+    def refresh_catalog_snapshot() -> CatalogSnapshot:
+        """Rebuild the snapshot if any input changed, then swap it in atomically."""
+        _snapshot_state["dirty"] = False
+        fp = catalog_fingerprint()
+        snap = _snapshot_state["current"]
+        if snap is not None and snap.fingerprint == fp:
+            return snap
+
+        with _snapshot_lock:
+            # Another thread may have rebuilt it while we were waiting.
+            snap = _snapshot_state["current"]
+            if snap is not None and snap.fingerprint == fp:
+                return snap
+
+            # The fingerprint is taken BEFORE loading: if an input changes mid-build,
+            # the next check sees a mismatch and rebuilds again.
+            docu_index = get_docubeauty_index(app.root_path, fp[0])
+            if snap is not None and snap.assets is not None and asset_sig_parts(snap.fingerprint) == asset_sig_parts(fp):
+                assets = snap.assets  # no image directory or derivative manifest changed
+            else:
+                assets = AssetManifest.scan(app.static_folder, EXPORT_IMAGES)
+            products = tuple(load_products(docu_index, assets))
+            version = hashlib.md5(repr(fp).encode("utf-8", errors="ignore")).hexdigest()[:12]
+            # An /edit of existing products patches the previous snapshot; anything that moves
+            # products between listings (or a new DocuBeauty index) gets a full build.
+            patched = snap.patched(version, fp, products, docu_index, assets) if snap is not None else None
+            snap = patched or CatalogSnapshot.build(version, fp, products, docu_index, assets)
+            _snapshot_state["current"] = snap
+            return snap
+
+    def invalidate_catalog() -> None:
+        """Called after every local write so this worker never serves its own stale edit."""
+        _snapshot_state["dirty"] = True
+        if has_request_context():
+            g.pop("_rc_catalog_snapshot", None)
+            g.pop("_rc_categories", None)
+
+    catalog_watcher: Optional[CatalogWatcher] = None
+    _watch_mode = (os.getenv("CATALOG_WATCH") or "").strip().lower()
+    if _watch_mode in ("1", "true", "yes", "on", "inotify", "poll"):
+        try:
+            _watch_interval = float(os.getenv("CATALOG_WATCH_INTERVAL") or 2.0)
+        except ValueError:
+            _watch_interval = 2.0
+        catalog_watcher = CatalogWatcher(
+            catalog_watch_dirs,
+            refresh_catalog_snapshot,
+            mode="poll" if _watch_mode == "poll" else "inotify",
+            interval=_watch_interval,
+        ).start()
+
+    def _shared_catalog_snapshot() -> CatalogSnapshot:
+        snap = _snapshot_state["current"]
+        if (
+            snap is not None
+            and catalog_watcher is not None
+            and catalog_watcher.is_active()
+            and not _snapshot_state["dirty"]
+        ):
+            return snap
+        return refresh_catalog_snapshot()
 
-    def get_catalog() -> List[Product]:
-        return load_products()
+    # -------------------------
+    # Request context
+    # -------------------------
+    # Route handlers and templates share one snapshot/cart computation per request via flask.g.
+    # Template globals are lazy proxies, so pages that never show the cart do not compute it.
+    def request_cached(key: str, build: Callable[[], Any]) -> Any:
+        if not has_request_context():
+            return build()
+        attr = f"_rc_{key}"
+        if attr not in g:
+            setattr(g, attr, build())
+        return getattr(g, attr)
+
+    def get_catalog_snapshot() -> CatalogSnapshot:
+        """Catalog snapshot of the current request (one page never mixes two catalog versions)."""
+        return request_cached("catalog_snapshot", _shared_catalog_snapshot)
+
+    def get_catalog() -> Tuple[Product, ...]:
+        return get_catalog_snapshot().products
 
     def get_categories(catalog: List[Product]) -> List[str]:
         cats = {p.category for p in catalog if (p.category or '').strip()}
@@ -1856,9 +3662,9 @@ def create_app() -> Flask:
         session["cart"] = clean
         return clean
 
-    def cart_summary(catalog: List[Product]) -> Dict[str, Any]:
+    def cart_summary(snap: CatalogSnapshot) -> Dict[str, Any]:
         cart = get_cart()
-        by_id = {p.id: p for p in catalog}
+        by_id = snap.by_id
 
         # Count only items that still exist in the catalog.
         # This prevents showing "1" when the cart contains stale/unknown product IDs.
@@ -1878,14 +3684,79 @@ def create_app() -> Flask:
         session["cart"] = valid_cart
         return {"count": count, "total": total}
 
+    def current_cart_summary() -> Dict[str, Any]:
+        """cart_summary() for template globals; the cart API recomputes after every change."""
+        return request_cached("cart_summary", lambda: cart_summary(get_catalog_snapshot()))
+
+    def current_categories() -> List[str]:
+        return request_cached("categories", lambda: get_categories(get_catalog_snapshot().products))
+
     # -------------------------
     # Cache headers
     # -------------------------
+    # - cart, checkout and /edit (and anything an admin sees): private, no-store
+    # - downloads (/download, /open): private, no-cache, so a browser may keep the file and
+    #   revalidate it (304) or resume it with Range/If-Range against the same ETag
+    # - static files with ?v=<current content hash>: immutable for a year; other static/media files keep
+    #   send_file's public max-age=STATIC_MAX_AGE plus ETag/Last-Modified revalidation
+    # - responses that opted into shared caching themselves (search suggestions, /api/products)
+    # - catalog HTML: private (it carries the cart badge), max-age=HTML_MAX_AGE, ETag-revalidated
+    # - everything else: private, no-cache
+    HTML_MAX_AGE = int(os.getenv("HTML_MAX_AGE") or 0)
+    IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+    NO_STORE_ENDPOINTS = frozenset({
+        "cart",
+        "checkout",
+        "checkout_success",
+        "checkout_cancel",
+        "edit",
+        "download_data",
+        "api_cart_add",
+        "api_cart_update",
+        "api_cart_clear",
+    })
+    CATALOG_HTML_ENDPOINTS = frozenset({"shop", "product", "docu_item_detail", "about", "contact"})
+    DOWNLOAD_ENDPOINTS = frozenset({"download_file", "docu_open_item"})
+
     @app.after_request
-    def add_no_cache_headers(resp):
-        resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-        resp.headers["Pragma"] = "no-cache"
-        resp.headers["Expires"] = "0"
+    def apply_cache_policy(resp):
+        endpoint = request.endpoint or ""
+        cc = resp.cache_control
+
+        # Static, media, download and shared-cache responses are decided without reading the
+        # session: touching it makes Flask add "Vary: Cookie", which defeats shared caches.
+        if endpoint in DOWNLOAD_ENDPOINTS:
+            resp.headers["Cache-Control"] = "private, no-cache"
+            resp.headers.pop("Expires", None)
+            return resp
+
+        if endpoint in ("static", "media"):
+            v = request.args.get("v")
+            if (
+                endpoint == "static"
+                and v
+                and resp.status_code in (200, 206, 304)
+                and v == static_digest((request.view_args or {}).get("filename") or "")
+            ):
+                resp.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+                resp.expires = int(time.time() + IMMUTABLE_MAX_AGE)
+            return resp
+
+        if cc.public:
+            return resp
+
+        if endpoint in NO_STORE_ENDPOINTS or session.get("is_admin"):
+            resp.headers["Cache-Control"] = "private, no-store, max-age=0"
+            resp.headers["Pragma"] = "no-cache"
+            resp.headers["Expires"] = "0"
+            return resp
+
+        if endpoint in CATALOG_HTML_ENDPOINTS and resp.status_code == 200 and not resp.direct_passthrough:
+            resp.headers["Cache-Control"] = f"private, max-age={HTML_MAX_AGE}, must-revalidate"
+            resp.add_etag()
+            return resp.make_conditional(request)
+
+        resp.headers["Cache-Control"] = "private, no-cache"
         return resp
 
     # -------------------------
@@ -1893,15 +3764,127 @@ def create_app() -> Flask:
     # -------------------------
     @app.context_processor
     def inject_globals():
-        catalog = get_catalog()
-        summ = cart_summary(catalog)
+        if g.get("_page_cache_render"):
+            # Rendering into the shared page cache: the cart badge is filled in per request.
+            cart_count, cart_total = PAGE_CART_COUNT_MARK, PAGE_CART_TOTAL_MARK
+        else:
+            cart_count = LocalProxy(lambda: current_cart_summary()["count"])
+            cart_total = LocalProxy(lambda: format_pln(current_cart_summary()["total"]))
         return dict(
-            cart_count=summ["count"],
-            cart_total=format_pln(summ["total"]),
-            categories=get_categories(catalog),
-            static_version=STATIC_VERSION,
+            cart_count=cart_count,
+            cart_total=cart_total,
+            categories=LocalProxy(current_categories),
         )
 
+    # -------------------------
+    # Full-page cache (anonymous catalog pages)
+    # -------------------------
+    # Rendered pages are keyed by (path, whitelisted query args, mobile flag); the cart badge
+    # is a placeholder substituted after the lookup, so a hit skips the view and Jinja.
+    # Each entry carries surrogate keys ("shop", "product:<id>", "category:<slug>"): an /edit
+    # write purges only the pages it touches, while a catalog change made outside this worker
+    # (another worker, the scraper, a deploy) clears the whole cache. Admin and post-payment
+    # sessions always render live.
+    PAGE_CART_COUNT_MARK = Markup("<!--page-cache:cart-count-->")
+    PAGE_CART_TOTAL_MARK = Markup("<!--page-cache:cart-total-->")
+    # The only query args cached views and the layout read; anything else (tracking params,
+    # junk) maps to the same entry instead of filling the LRU with copies.
+    PAGE_CACHE_ARGS = ("q", "category", "sort", "page", "per_page", "ext", "price")
+    _page_cache_size = int(os.getenv("PAGE_CACHE_SIZE") or 512)
+    _page_cache: Optional[LRUCache] = LRUCache(_page_cache_size) if _page_cache_size > 0 else None
+    # Catalog version the cached pages belong to.
+    _page_cache_state: Dict[str, Optional[str]] = {"version": None}
+
+    def page_cacheable() -> bool:
+        return request.method == "GET" and not session.get("is_admin") and not session.get("paid_session_id")
+
+    def product_surrogate_keys(p: Optional[Product]) -> set[str]:
+        if p is None:
+            return set()
+        keys = {f"product:{p.id}"}
+        keys.update(f"category:{s}" for s in (p.category_slug, p.docu_cat_slug) if s)
+        return keys
+
+    def purge_pages(keys: Optional[Iterable[str]] = None) -> int:
+        """Drop cached pages tagged with any of `keys` (None drops everything)."""
+        if _page_cache is None:
+            return 0
+        if keys is None:
+            n = len(_page_cache)
+            _page_cache.clear()
+            return n
+        keys = frozenset(keys)
+        return _page_cache.discard(lambda _k, entry: not keys.isdisjoint(entry[2]))
+
+    def page_cache_key() -> Tuple[Any, ...]:
+        args = tuple((k, v) for k in PAGE_CACHE_ARGS for v in (request.args.get(k) or "",) if v)
+        return (request.script_root, request.path, args, is_mobile_request())
+
+    def sync_page_cache(version: str) -> None:
+        """Clear the page cache when the catalog moved on without an /edit purge."""
+        if _page_cache_state["version"] != version:
+            _page_cache_state["version"] = version
+            purge_pages()
+
+    def cached_page(surrogate_keys: Optional[Callable[..., Iterable[str]]] = None):
+        """Serve a view from the page cache; `surrogate_keys(**view_args)` tags new entries."""
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if _page_cache is None or not page_cacheable():
+                    return view(**kwargs)
+
+                version = get_catalog_snapshot().version
+                sync_page_cache(version)
+                key = page_cache_key()
+                entry = _page_cache.get(key)
+                state = "HIT"
+                if entry is None:
+                    state = "MISS"
+                    g._page_cache_render = True
+                    try:
+                        resp = app.make_response(view(**kwargs))
+                    finally:
+                        g.pop("_page_cache_render", None)
+                    if resp.status_code != 200 or resp.mimetype != "text/html":
+                        return resp
+                    tags = frozenset(surrogate_keys(**kwargs)) if surrogate_keys else frozenset()
+                    entry = (resp.get_data(), resp.mimetype, tags)
+                    # A page rendered from a catalog that changed meanwhile is served, not stored.
+                    if _page_cache_state["version"] == version:
+                        _page_cache.set(key, entry)
+
+                summary = current_cart_summary()
+                body = entry[0].replace(
+                    PAGE_CART_COUNT_MARK.encode("utf-8"), str(summary["count"]).encode("utf-8")
+                ).replace(
+                    PAGE_CART_TOTAL_MARK.encode("utf-8"), str(escape(format_pln(summary["total"]))).encode("utf-8")
+                )
+                resp = app.response_class(body, mimetype=entry[1])
+                resp.headers["X-Page-Cache"] = state
+                return resp
+
+            return wrapper
+
+        return decorator
+
+    def edit_surrogate_keys(action: str, form) -> Optional[set[str]]:
+        """Pages touched by an /edit action; None when the change can reach every page."""
+        if action == "logout":
+            return set()
+        snap = get_catalog_snapshot()
+        if action in ("product_update", "product_photo", "product_delete"):
+            p = snap.by_id.get((form.get("product_id") or "").strip())
+            if p is None:
+                return None
+            return product_surrogate_keys(p) | {"shop"}
+        if action == "cat_photo":
+            slug = (form.get("cat_slug") or "").strip()
+            return {f"category:{slug}", "shop"} if slug else None
+        # Category structure, new products and bulk edits change menus and listings everywhere.
+        return None
+
     # -------------------------
     # Media serving (exported images)
     # -------------------------
@@ -1911,11 +3894,35 @@ def create_app() -> Flask:
         fs = os.path.join(EXPORT_IMAGES, filename)
         if os.path.exists(fs):
             return send_from_directory(EXPORT_IMAGES, filename)
+        # max_age=0: the real image may be exported later, so browsers must not keep this.
         return send_file(
             os.path.join(app.static_folder, PLACEHOLDER_THUMB),
             mimetype="image/svg+xml",
+            max_age=0,
         )
 
+    @app.get("/thumb/<size>/<path:filename>")
+    def thumb(size: str, filename: str):
+        dims = THUMB_SIZES.get(size)
+        # Normalise before picking the root: "cards/../cache/x.png" must not pass as cards/.
+        filename = posixpath.normpath(filename.replace("\\", "/"))
+        root, _, rel = filename.partition("/")
+        if dims is None or root not in ("cards", "uploads", "media") or not rel:
+            abort(404)
+        if os.path.splitext(rel)[1].lower() not in IMAGE_DERIVATIVE_EXTS:
+            abort(404)
+        # safe_join keeps the source inside that root (no "..", no absolute paths).
+        src = safe_join(EXPORT_IMAGES if root == "media" else os.path.join(app.static_folder, root), rel)
+        if not src or not os.path.isfile(src):
+            abort(404)
+        out = thumb_cache.get_or_create(src, *dims)
+        if out is None:
+            # No Pillow/WebP here, or an undecodable image: serve the original instead.
+            if root == "media":
+                return redirect(url_for("media", filename=rel))
+            return redirect(url_for("static", filename=filename))
+        return send_file(out, mimetype="image/webp")
+
     # -------------------------
     # Routes
     # -------------------------
@@ -1924,6 +3931,7 @@ def create_app() -> Flask:
         return redirect(url_for("shop"))
 
     @app.get("/o-nas")
+    @cached_page()
     def about():
         return render_template(
             "index.html",
@@ -1932,6 +3940,7 @@ def create_app() -> Flask:
         )
 
     @app.get("/kontakt")
+    @cached_page()
     def contact():
         return render_template(
             "index.html",
@@ -1939,15 +3948,73 @@ def create_app() -> Flask:
             title="Kontakt",
         )
 
-    @app.get("/shop")
-    def shop():
-        catalog = get_catalog()
+    # -------------------------
+    # Shop listing (shared by /shop and /api/products)
+    # -------------------------
+    def shop_listing(snap: CatalogSnapshot, args) -> Tuple[Sequence[Product], Dict[str, Any], Dict[str, Any]]:
+        """Resolve category/q/sort/ext/price request args against the snapshot.
 
-        is_docu_mode = any(p.docu_cat_slug for p in catalog)
+        Returns (ordered products, facet counts, normalised params).
+        """
+        q = (args.get("q") or "").strip()
+        cat = (args.get("category") or "").strip()  # slug
+        sort = (args.get("sort") or "").strip()
+
+        # Pre-sorted listing (Polish collation by title, or by price):
+        # - no category: DocuBeauty category cards (DocuBeauty mode) or all products
+        # - category: matching rules live in CatalogSnapshot.build (by_category_slug); in
+        #   DocuBeauty mode the category cards themselves are hidden once a category is selected.
+        sort_mode = sort if sort in CatalogSnapshot.SORTS else ""
+        filtered: Sequence[Product] = snap.sorted_views.get((cat, sort_mode), ())
+
+        # Facet filters: file format (?ext=pdf) and price bucket (?price=39).
+        ext = (args.get("ext") or "").strip().lower().lstrip(".")
+        try:
+            price_bucket = int(float(args.get("price") or 0))
+        except Exception:
+            price_bucket = 0
+        if snap.is_docu_mode and not cat:
+            # The default DocuBeauty view lists category cards, which have no file format or
+            # price: format/price filters (and their sidebar groups) apply once a category is chosen.
+            ext, price_bucket = "", 0
+
+        facets = snap.facets or FacetIndex(())
+        query_mask = -1  # all bits
+        scores: Dict[int, float] = {}
+        if q:
+            # Diacritic-insensitive, inflection-tolerant lookup (see SearchIndex).
+            scores = snap.search.search(q) if snap.search is not None else {}
+            if not scores and snap.search is not None and snap.trigrams is not None:
+                # Nothing matched exactly: retry with misspelling-tolerant word matching.
+                scores = snap.search.search(q, fuzzy=snap.trigrams)
+            query_mask = FacetIndex.mask(scores)
+        ext_mask = facets.ext.get(ext, 0) if ext else -1
+        price_mask = facets.price.get(price_bucket, 0) if price_bucket else -1
+
+        # Each facet is counted with the other active filters applied.
+        result_mask = snap.view_masks.get(cat, 0) & query_mask
+        facet_counts: Dict[str, Any] = {
+            "ext": facets.counts(facets.ext, result_mask & price_mask),
+            "price": facets.counts(facets.price, result_mask & ext_mask),
+        }
+        if q or ext or price_bucket:
+            narrowed = query_mask & ext_mask & price_mask
+            facet_counts["category"] = {
+                c["slug"]: (snap.view_masks.get(c["slug"], 0) & narrowed).bit_count() for c in snap.menu_categories
+            }
+            final_mask = result_mask & ext_mask & price_mask
+            filtered = [p for p in filtered if (final_mask >> snap.position[p.id]) & 1]
+            if q and not sort_mode:
+                # No explicit sort: best matches first (stable, so ties stay alphabetical).
+                filtered.sort(key=lambda p: -scores[snap.position[p.id]])
 
-        q = (request.args.get("q") or "").strip()
-        cat = (request.args.get("category") or "").strip()  # slug
-        sort = (request.args.get("sort") or "").strip()
+        params = {"q": q, "category": cat, "sort": sort, "ext": ext, "price": price_bucket}
+        return filtered, facet_counts, params
+
+    @app.get("/shop")
+    @cached_page(lambda: ("shop",))
+    def shop():
+        snap = get_catalog_snapshot()
         page = request.args.get("page", "1")
 
         try:
@@ -1970,81 +4037,15 @@ def create_app() -> Flask:
                     per_page = v
             except Exception:
                 pass
-        # Category menu source:
+
+        # Category menu (left sidebar / mobile strip), prebuilt per snapshot:
         # - In DocuBeauty mode: categories are navigation cards (dbcat:...) + custom category cards (cat:...).
         # - Otherwise: categories are derived from product.category.
-        if is_docu_mode:
-            menu_source = [p for p in catalog if ((p.docu_cat_slug and not p.docu_item_id) or p.id.startswith("cat:"))]
-        else:
-            menu_source = catalog
-
-        filtered = catalog
-
-        # DocuBeauty default view: show only category cards unless a category is selected.
-        if is_docu_mode and not cat:
-            filtered = list(menu_source)
-
-        if cat:
-            selected_docu_slug = ""
-            if is_docu_mode:
-                try:
-                    for cp in menu_source:
-                        if cp.docu_cat_slug and not cp.docu_item_id and slugify(cp.title) == cat:
-                            selected_docu_slug = cp.docu_cat_slug
-                            break
-                except Exception:
-                    selected_docu_slug = ""
-
-            def _cat_match(p: Product) -> bool:
-                # DocuBeauty category cards (dbcat:...) and custom category cards (cat:...) are
-                # matched by their title slug.
-                if (p.docu_cat_slug and not p.docu_item_id) or p.id.startswith("cat:"):
-                    return slugify(p.title) == cat
-                # DocuBeauty items: match the selected DocuBeauty slug when available.
-                if selected_docu_slug and p.docu_cat_slug:
-                    return p.docu_cat_slug == selected_docu_slug
-                # Custom/regular products fall back to matching by category name.
-                # Additionally accept docu-cat slug stored on custom products.
-                if selected_docu_slug and p.id.startswith("custom:") and p.docu_cat_slug:
-                    return p.docu_cat_slug == selected_docu_slug
-                return slugify(p.category) == cat
-
-            filtered = [p for p in filtered if _cat_match(p)]
-
-            # In DocuBeauty mode when a category is selected, show only products/items inside it
-            # (hide the category card itself).
-            if is_docu_mode:
-                filtered = [p for p in filtered if not ((p.docu_cat_slug and not p.docu_item_id) or p.id.startswith("cat:"))]
-
-        if q:
-            ql = q.lower()
-            filtered = [
-                p
-                for p in filtered
-                if ql in p.title.lower() or ql in (p.description or "").lower()
-            ]
-
-        if sort == "price_asc":
-            filtered = sorted(filtered, key=lambda p: (p.price_pln, p.title.lower()))
-        elif sort == "price_desc":
-            filtered = sorted(filtered, key=lambda p: (-p.price_pln, p.title.lower()))
-        else:
-            filtered = sorted(filtered, key=lambda p: p.title.lower())
-
+        menu_categories = snap.menu_categories
 
-        # Build category menu (unique categories for left sidebar / mobile strip)
-        menu_categories: List[Dict[str, str]] = []
-        seen_slugs: set[str] = set()
-        for p in menu_source:
-            if (p.docu_cat_slug and not p.docu_item_id) or p.id.startswith("cat:"):
-                label = p.title
-            else:
-                label = p.category
-            slug = slugify(label)
-            if slug in seen_slugs:
-                continue
-            seen_slugs.add(slug)
-            menu_categories.append({"label": label, "slug": slug})
+        filtered, facet_counts, params = shop_listing(snap, request.args)
+        q, cat, sort = params["q"], params["category"], params["sort"]
+        ext, price_bucket = params["ext"], params["price"]
 
         total = len(filtered)
         pages = max(1, math.ceil(total / per_page))
@@ -2073,60 +4074,165 @@ def create_app() -> Flask:
             total=total,
             page_range=page_range,
             categories=menu_categories,
+            active_ext=ext,
+            active_price=price_bucket,
+            facet_counts=facet_counts,
+            filter_args={k: v for k, v in (("ext", ext), ("price", price_bucket)) if v},
         )
 
+    # Suggestions repeat heavily across visitors (same prefixes typed by everyone), so the
+    # serialised answer is cached per (catalog version, normalised query) and marked public.
+    _suggest_cache = LRUCache(int(os.getenv("SUGGEST_CACHE_SIZE") or 2048))
+    SUGGEST_MAX_AGE = int(os.getenv("SUGGEST_MAX_AGE") or 60)
+
+    def _build_suggest_payload(snap: CatalogSnapshot, q: str) -> Dict[str, Any]:
+        index = snap.suggest
+        if not q or index is None:
+            return {"products": [], "categories": []}
+
+        products = index.suggest_products(q, limit=8)
+        categories = index.suggest_categories(q, limit=6)
+        if not products and not categories and snap.trigrams is not None:
+            # Nothing matched exactly: retry with misspelling-tolerant word matching.
+            products = index.suggest_products(q, limit=8, fuzzy=snap.trigrams)
+            categories = index.suggest_categories(q, limit=6, fuzzy=snap.trigrams)
+
+        prod_matches = [
+            {
+                "id": p.id,
+                "title": p.title,
+                "category": p.category,
+                "category_slug": p.category_slug,
+                "price": p.display_price(),
+                "thumb": thumb_url(p, "96x96"),
+            }
+            for p in products
+        ]
+        cat_matches = [
+            {"name": name, "slug": slugify(name), "count": cnt}
+            for name, cnt in categories
+        ]
+        return {"products": prod_matches, "categories": cat_matches}
+
     @app.get("/api/search_suggest")
     def search_suggest():
-        catalog = get_catalog()
-        q = (request.args.get("q") or "").strip().lower()
+        q = (request.args.get("q") or "").strip()
+        snap = get_catalog_snapshot()
+
+        # Suggestions only depend on the folded query tokens (see SuggestIndex); the payload's
+        # product and thumb URLs also carry the mount point, as in the fragment cache.
+        tokens = " ".join(dict.fromkeys(search_tokens(q)))
+        key = (snap.version, request.script_root, tokens)
+        cached = _suggest_cache.get(key)
+        if cached is None:
+            body = jsonify(_build_suggest_payload(snap, tokens)).get_data()
+            etag = hashlib.md5(snap.version.encode("utf-8") + body).hexdigest()[:20]
+            cached = (body, etag)
+            _suggest_cache.set(key, cached)
+
+        body, etag = cached
+        resp = app.response_class(body, mimetype="application/json")
+        resp.set_etag(etag)
+        resp.cache_control.public = True
+        resp.cache_control.max_age = SUGGEST_MAX_AGE
+        return resp.make_conditional(request)
 
-        # Suggestions should appear immediately while typing.
-        if len(q) < 1:
-            return jsonify({"products": [], "categories": []})
+    # -------------------------
+    # Catalog JSON API
+    # -------------------------
+    # /api/products?category=&q=&sort=&ext=&price=  (same filters as /shop)
+    #   &limit=1..100 (default 24)  &cursor=<next_cursor>  &fields=id,title,price,...
+    # The cursor remembers the last returned id, so paging survives a catalog refresh.
+    PRODUCTS_API_MAX_AGE = int(os.getenv("PRODUCTS_API_MAX_AGE") or 60)
+    PRODUCT_API_FIELDS: Dict[str, Callable[[Product], Any]] = {
+        "id": lambda p: p.id,
+        "title": lambda p: p.title,
+        "category": lambda p: p.category,
+        "category_slug": lambda p: p.category_slug,
+        "price": lambda p: p.display_price(),
+        "price_pln": lambda p: p.price_pln,
+        "description": lambda p: p.description,
+        "thumb": lambda p: thumb_url(p),
+        "url": lambda p: url_for("product", pid=p.id),
+        "is_category": lambda p: p.is_category_card(),
+        "docu_cat_slug": lambda p: p.docu_cat_slug,
+        "docu_item_id": lambda p: p.docu_item_id,
+    }
+    PRODUCT_API_DEFAULT_FIELDS = ("id", "title", "category", "category_slug", "price", "price_pln", "thumb", "url")
+
+    def _encode_cursor(offset: int, last_id: str) -> str:
+        raw = json.dumps([offset, last_id], separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def _decode_cursor(cursor: str, listing: Sequence[Product]) -> int:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            offset, last_id = json.loads(raw.decode("utf-8"))
+            offset = max(0, int(offset))
+            last_id = str(last_id)
+        except Exception:
+            abort(400, "Invalid cursor")
+        if 0 < offset <= len(listing) and listing[offset - 1].id == last_id:
+            return offset
+        # The catalog changed since the cursor was issued: continue after the same product.
+        for i, p in enumerate(listing):
+            if p.id == last_id:
+                return i + 1
+        return min(offset, len(listing))
+
+    @app.get("/api/products")
+    def api_products():
+        snap = get_catalog_snapshot()
+
+        etag = hashlib.md5(f"{snap.version}?{request.query_string.decode('latin-1')}".encode("utf-8")).hexdigest()[:20]
+        if etag in request.if_none_match:
+            resp = app.response_class(status=304)
+        else:
+            listing, _, params = shop_listing(snap, request.args)
 
-        prod_matches = []
-        for p in catalog:
-            # Exclude navigation-only category cards from product suggestions.
-            if p.id.startswith("cat:") or (p.docu_cat_slug and not p.docu_item_id) or p.id.startswith("dbcat:"):
-                continue
+            try:
+                limit = max(1, min(100, int(request.args.get("limit") or 24)))
+            except Exception:
+                limit = 24
 
-            hay = f"{p.title} {p.category} {getattr(p, 'description', '')}".lower()
-            if q in hay:
-                thumb_url_str = thumb_url(p)
-                prod_matches.append(
-                    {
-                        "id": p.id,
-                        "title": p.title,
-                        "category": p.category,
-                        "category_slug": slugify(p.category),
-                        "price": p.display_price(),
-                        "thumb": thumb_url_str,
-                    }
-                )
-            if len(prod_matches) >= 8:
-                break
+            requested = [f.strip() for f in (request.args.get("fields") or "").split(",") if f.strip()]
+            fields = [f for f in requested if f in PRODUCT_API_FIELDS] or list(PRODUCT_API_DEFAULT_FIELDS)
 
-        cat_counts: Dict[str, int] = {}
-        for p in catalog:
-            if p.id.startswith("cat:") or (p.docu_cat_slug and not p.docu_item_id) or p.id.startswith("dbcat:"):
-                continue
-            cat_counts[p.category] = cat_counts.get(p.category, 0) + 1
+            cursor = (request.args.get("cursor") or "").strip()
+            start = _decode_cursor(cursor, listing) if cursor else 0
+            page_items = listing[start : start + limit]
+            end = start + len(page_items)
 
-        cat_matches = []
-        for name, cnt in sorted(cat_counts.items(), key=lambda x: x[0].lower()):
-            if q in name.lower():
-                cat_matches.append({"name": name, "slug": slugify(name), "count": cnt})
-            if len(cat_matches) >= 6:
-                break
+            resp = jsonify(
+                {
+                    "version": snap.version,
+                    "total": len(listing),
+                    "items": [{f: PRODUCT_API_FIELDS[f](p) for f in fields} for p in page_items],
+                    "next_cursor": _encode_cursor(end, page_items[-1].id) if page_items and end < len(listing) else None,
+                    "params": params,
+                }
+            )
+        resp.set_etag(etag)
+        resp.cache_control.public = True
+        resp.cache_control.max_age = PRODUCTS_API_MAX_AGE
+        return resp
 
-        return jsonify({"products": prod_matches, "categories": cat_matches})
+    def _product_page_keys(pid: str) -> set[str]:
+        p = get_catalog_snapshot().by_id.get(pid)
+        keys = product_surrogate_keys(p) | {f"product:{pid}"}
+        if p is not None and p.title_slug:
+            # DocuBeauty category pages also list custom products filed under the title slug.
+            keys.add(f"category:{p.title_slug}")
+        return keys
 
     @app.get("/product/<pid>")
+    @cached_page(_product_page_keys)
     def product(pid: str):
-        catalog = get_catalog()
+        snap = get_catalog_snapshot()
+        docu_index = snap.docu_index
         # Used to fully hide deleted products from DocuBeauty category pages and deep links.
         deleted_ids = load_deleted_products()
-        p = next((x for x in catalog if x.id == pid), None)
+        p = snap.by_id.get(pid)
         if not p:
             return redirect(url_for("shop"))
 
@@ -2140,10 +4246,10 @@ def create_app() -> Flask:
             # If an item was deleted in admin, treat it as non-existent.
             if f"dbitem:{p.docu_cat_slug}:{p.docu_item_id}" in deleted_ids:
                 return redirect(url_for("shop"))
-            cat = get_docubeauty_category(app.root_path, p.docu_cat_slug)
+            cat = docu_index.category(p.docu_cat_slug)
             if not cat:
                 return redirect(url_for("shop"))
-            item = get_docubeauty_item_by_id(cat, p.docu_item_id)
+            item = docu_index.item(p.docu_cat_slug, p.docu_item_id)
             if not item:
                 return redirect(url_for("shop"))
 
@@ -2157,8 +4263,8 @@ def create_app() -> Flask:
             elif hero and p.image_source == "static":
                 item["thumb_rel"] = hero
             else:
-                thumb_rel = f"cards/items/{p.docu_cat_slug}/{p.docu_item_id}.png"
-                if os.path.exists(os.path.join(app.static_folder, thumb_rel)):
+                thumb_rel = docu_index.thumbs.get((p.docu_cat_slug, p.docu_item_id))
+                if thumb_rel:
                     item["thumb_rel"] = thumb_rel
 
             # Ensure displayed category name can be renamed via overrides.
@@ -2180,15 +4286,9 @@ def create_app() -> Flask:
         docu_items = []
         custom_in_docu_cat: List[Product] = []
         if p.docu_cat_slug and not p.docu_item_id:
-            docu_cat = get_docubeauty_category(app.root_path, p.docu_cat_slug)
+            docu_cat = docu_index.category(p.docu_cat_slug)
             if docu_cat:
-                # Map file-id -> sellable product (price, cart id)
-                item_product_by_id = {
-                    x.docu_item_id: x
-                    for x in catalog
-                    if x.docu_cat_slug == p.docu_cat_slug and x.docu_item_id
-                }
-                raw_items = list_docubeauty_items_for_category(docu_cat)
+                raw_items = docu_index.items.get(p.docu_cat_slug, [])
                 # attach optional preview card (if exists)
                 for it in raw_items:
                     it = dict(it)
@@ -2199,13 +4299,13 @@ def create_app() -> Flask:
                         continue
 
                     # Default thumb: prebuilt card if exists
-                    thumb_rel = f"cards/items/{p.docu_cat_slug}/{item_id_str}.png"
-                    if item_id_str and os.path.exists(os.path.join(app.static_folder, thumb_rel)):
+                    thumb_rel = docu_index.thumbs.get((p.docu_cat_slug, item_id_str))
+                    if thumb_rel:
                         it["thumb_rel"] = thumb_rel
 
                     # If there is a sellable product for this file, prefer its (possibly overridden)
                     # title/description/photo/price.
-                    prod = item_product_by_id.get(item_id_str)
+                    prod = snap.by_docu_item.get((p.docu_cat_slug, item_id_str))
                     if prod:
                         it["product_id"] = prod.id
                         it["price"] = prod.display_price()
@@ -2226,15 +4326,8 @@ def create_app() -> Flask:
                     cat_label = str(docu_cat.get("name_pl") or p.title or "").strip()
                 except Exception:
                     cat_label = str(p.title or "").strip()
-                wanted = {p.docu_cat_slug, slugify(cat_label), slugify(p.title)}
-                custom_in_docu_cat = [
-                    x for x in catalog
-                    if x.id.startswith("custom:")
-                    and (
-                        (x.docu_cat_slug and x.docu_cat_slug in wanted)
-                        or slugify(x.category) in wanted
-                    )
-                ]
+                wanted = {p.docu_cat_slug, slugify(cat_label), p.title_slug}
+                custom_in_docu_cat = snap.custom_in(wanted)
 
         download_url = None
         # Only allow direct downloads after payment (verified with Stripe).
@@ -2275,6 +4368,7 @@ def create_app() -> Flask:
 
 
     @app.get("/docu/<cat_slug>/<item_id>")
+    @cached_page(lambda cat_slug, item_id: (f"product:dbitem:{cat_slug}:{item_id}", f"category:{cat_slug}"))
     def docu_item_detail(cat_slug: str, item_id: str):
         """Detail page for a single file inside a DocuBeauty package."""
         # If an admin deleted this item-product, hide the deep link as well.
@@ -2282,17 +4376,18 @@ def create_app() -> Flask:
         if f"dbitem:{cat_slug}:{item_id}" in deleted_ids:
             return redirect(url_for("shop"))
 
-        cat = get_docubeauty_category(app.root_path, cat_slug)
+        snap = get_catalog_snapshot()
+        docu_index = snap.docu_index
+        cat = docu_index.category(cat_slug)
         if not cat:
             return redirect(url_for("shop"))
 
-        item = get_docubeauty_item_by_id(cat, item_id)
+        item = docu_index.item(cat_slug, item_id)
         if not item:
             return redirect(url_for("shop"))
 
         # Resolve the sellable item-product (price/cart id).
-        catalog = get_catalog()
-        prod = next((x for x in catalog if x.docu_cat_slug == cat_slug and x.docu_item_id == item_id), None)
+        prod = snap.by_docu_item.get((cat_slug, item_id))
         if not prod:
             # Fallback pseudo-product (keeps the page usable even if item products are not prebuilt).
             try:
@@ -2330,8 +4425,8 @@ def create_app() -> Flask:
 
         # Fallback to prebuilt cards/items/... if product does not provide a thumb.
         if not item.get("thumb_rel"):
-            thumb_rel = f"cards/items/{cat_slug}/{item_id}.png"
-            if os.path.exists(os.path.join(app.static_folder, thumb_rel)):
+            thumb_rel = docu_index.thumbs.get((cat_slug, item_id))
+            if thumb_rel:
                 item["thumb_rel"] = thumb_rel
 
         # Ensure the displayed category name reflects category overrides.
@@ -2349,6 +4444,21 @@ def create_app() -> Flask:
         )
 
 
+    def send_download(path: str, download_name: str):
+        """send_file() for package/file downloads with a validator every worker agrees on.
+
+        Werkzeug answers If-None-Match, If-Modified-Since, Range and If-Range itself (304, 206,
+        416); the ETag is built from size and mtime only (not the absolute path), so a resumed
+        download matches whichever worker serves the next chunk.
+        """
+        st = os.stat(path)
+        return send_file(
+            path,
+            as_attachment=True,
+            download_name=download_name,
+            etag=f"{st.st_size:x}-{st.st_mtime_ns:x}",
+        )
+
     @app.get("/open/<cat_slug>/<item_id>")
     def docu_open_item(cat_slug: str, item_id: str):
         """Direct download for DocuBeauty item (folder file or extracted from ZIP)."""
@@ -2357,11 +4467,12 @@ def create_app() -> Flask:
         if f"dbitem:{cat_slug}:{item_id}" in deleted_ids:
             abort(404)
 
-        cat = get_docubeauty_category(app.root_path, cat_slug)
+        docu_index = get_catalog_snapshot().docu_index
+        cat = docu_index.category(cat_slug)
         if not cat:
             abort(404)
 
-        item = get_docubeauty_item_by_id(cat, item_id)
+        item = docu_index.item(cat_slug, item_id)
         if not item:
             abort(404)
 
@@ -2370,10 +4481,12 @@ def create_app() -> Flask:
                 fs_path = item.get("abs")
                 if not fs_path or not os.path.isfile(fs_path):
                     abort(404)
-                return send_file(fs_path, as_attachment=True, download_name=os.path.basename(fs_path))
+                return send_download(fs_path, os.path.basename(fs_path))
 
             cached = ensure_cached_zip_member(app.root_path, cat, item)
-            return send_file(cached, as_attachment=True, download_name=os.path.basename(cached))
+            return send_download(cached, os.path.basename(cached))
+        except HTTPException:
+            raise  # 404 above, 416 for an unsatisfiable Range
         except Exception:
             abort(500)
 
@@ -2404,6 +4517,8 @@ def create_app() -> Flask:
             rel_prefix = (rel_prefix or "").replace("\\", "/")
             if rel_prefix and not rel_prefix.endswith("/"):
                 rel_prefix += "/"
+            if dst_dir == UPLOADS_DIR and ext in IMAGE_DERIVATIVE_EXTS:
+                schedule_image_derivatives([f"{rel_prefix}{new_name}"])
             return f"{rel_prefix}{new_name}"
 
         def _delete_static_rel(rel: str) -> None:
@@ -2545,6 +4660,20 @@ def create_app() -> Flask:
                     return jsonify(payload), status
                 return None
 
+            # Drop the cached pages this write touches once it has been applied.
+            purge_keys = edit_surrogate_keys(action, request.form)
+
+            @after_this_request
+            def _purge_cached_pages(resp):
+                if purge_keys is None:
+                    purge_pages()
+                elif purge_keys and _page_cache is not None:
+                    # Adopt the post-write catalog version first so the write does not read as an
+                    # outside change (full clear), and renders still on the old one are not stored.
+                    _page_cache_state["version"] = refresh_catalog_snapshot().version
+                    purge_pages(purge_keys)
+                return resp
+
             # ---------- Logout ----------
             if action == "logout":
                 session.pop("is_admin", None)
@@ -2667,18 +4796,18 @@ def create_app() -> Flask:
                 # in admin should hide BOTH the category card and ALL its items (dbitem:<slug>:<id>).
                 # This makes "Usuń kategorię" behave predictably for DocuBeauty content.
                 try:
-                    docu = build_docubeauty_products(app.root_path)
+                    docu_index = get_catalog_snapshot().docu_index
                     match_slug = ""
-                    for p0 in docu:
-                        if str(getattr(p0, "id", "")).startswith("dbcat:") and str(getattr(p0, "title", "")).strip().lower() == name.lower():
-                            match_slug = getattr(p0, "docu_cat_slug", "") or str(p0.id).split(":", 1)[1]
+                    for c0 in docu_index.categories:
+                        c0_title = str(c0.get("display_name") or c0.get("name") or "").strip()
+                        if c0.get("slug") and c0_title.lower() == name.lower():
+                            match_slug = str(c0.get("slug"))
                             break
                     if match_slug:
                         deleted = load_deleted_products()
                         ids_to_clean = {f"dbcat:{match_slug}"}
-                        for p0 in docu:
-                            if getattr(p0, "docu_cat_slug", "") == match_slug and getattr(p0, "docu_item_id", ""):
-                                ids_to_clean.add(str(p0.id))
+                        for _item_id in docu_index.item_ids(match_slug):
+                            ids_to_clean.add(f"dbitem:{match_slug}:{_item_id}")
 
                         for _id in ids_to_clean:
                             deleted.add(_id)
@@ -2933,10 +5062,9 @@ def create_app() -> Flask:
                         if pid.startswith("dbcat:"):
                             slug = pid.split(":", 1)[1]
                             try:
-                                docu = build_docubeauty_products(app.root_path)
-                                for p0 in docu:
-                                    if getattr(p0, "docu_cat_slug", "") == slug and getattr(p0, "docu_item_id", ""):
-                                        ids_to_clean.add(str(p0.id))
+                                docu_index = get_catalog_snapshot().docu_index
+                                for _item_id in docu_index.item_ids(slug):
+                                    ids_to_clean.add(f"dbitem:{slug}:{_item_id}")
                             except Exception:
                                 pass
 
@@ -3182,9 +5310,8 @@ def create_app() -> Flask:
 
     @app.get("/cart")
     def cart():
-        catalog = get_catalog()
+        by_id = get_catalog_snapshot().by_id
         cart_data = get_cart()
-        by_id = {p.id: p for p in catalog}
 
         lines = []
         subtotal = 0.0
@@ -3249,7 +5376,6 @@ def create_app() -> Flask:
                 downloads=[],
                 bundle_url=None,
                 customer_email=None,
-                static_version=STATIC_VERSION,
             )
 
         cs = verify_paid_checkout_session(session_id)
@@ -3289,8 +5415,9 @@ def create_app() -> Flask:
         #   * bundle ZIP (whole product)
         #   * individual files inside the category (watermarked previews elsewhere; downloads are originals)
         # - Legacy: use digital_goods/manifest.json mapping.
-        catalog = get_catalog()
-        by_id = {p.id: p for p in catalog}
+        catalog_snap = get_catalog_snapshot()
+        docu_index = catalog_snap.docu_index
+        by_id = catalog_snap.by_id
         docu_cats: List[Product] = []
         docu_items: List[Product] = []
         custom_products: List[Product] = []
@@ -3313,7 +5440,7 @@ def create_app() -> Flask:
 
         # DocuBeauty item purchases (single files)
         for p in docu_items:
-            cat = get_docubeauty_category(app.root_path, p.docu_cat_slug)
+            cat = docu_index.category(p.docu_cat_slug)
             if not cat:
                 continue
             token = make_download_token(session_id, {"kind": "docu", "cat": p.docu_cat_slug, "item": p.docu_item_id})
@@ -3323,7 +5450,7 @@ def create_app() -> Flask:
         # If a category card ever ends up in a paid cart, the customer should receive
         # the exact purchased bundle (ZIP) — not all internal files listed separately.
         for p in docu_cats:
-            cat = get_docubeauty_category(app.root_path, p.docu_cat_slug)
+            cat = docu_index.category(p.docu_cat_slug)
             if not cat:
                 continue
             try:
@@ -3367,12 +5494,11 @@ def create_app() -> Flask:
             downloads=downloads,
             bundle_url=bundle_url,
             customer_email=customer_email,
-            static_version=STATIC_VERSION,
         )
 
     @app.get("/checkout/cancel")
     def checkout_cancel():
-        return render_template("cancel.html", title="Płatność anulowana", static_version=STATIC_VERSION)
+        return render_template("cancel.html", title="Płatność anulowana")
 
 
     # -------------------------
@@ -3432,7 +5558,8 @@ def create_app() -> Flask:
                 if (expected_item_pid not in purchased_ids) and (expected_cat_pid not in purchased_ids):
                     abort(403, "Access denied")
 
-            cat = get_docubeauty_category(app.root_path, cat_slug)
+            docu_index = get_catalog_snapshot().docu_index
+            cat = docu_index.category(cat_slug)
             if not cat:
                 abort(404, "Category not found")
 
@@ -3442,14 +5569,14 @@ def create_app() -> Flask:
                     zp = cat.get("source_path") or ""
                     if not zp or not os.path.isfile(zp):
                         abort(404, "File not found")
-                    return send_file(zp, as_attachment=True, download_name=os.path.basename(zp))
+                    return send_download(zp, os.path.basename(zp))
                 # Directory -> zip it and serve cached archive
                 bundle_path = ensure_cached_dir_zip(app.root_path, cat)
-                return send_file(bundle_path, as_attachment=True, download_name=f"{cat_slug}.zip")
+                return send_download(bundle_path, f"{cat_slug}.zip")
 
             # kind == "docu" -> single file
 
-            item = get_docubeauty_item_by_id(cat, item_id)
+            item = docu_index.item(cat_slug, item_id)
             if not item:
                 abort(404, "Item not found")
 
@@ -3457,10 +5584,10 @@ def create_app() -> Flask:
                 fs_path = item.get("abs")
                 if not fs_path or not os.path.isfile(fs_path):
                     abort(404, "File not found")
-                return send_file(fs_path, as_attachment=True, download_name=os.path.basename(fs_path))
+                return send_download(fs_path, os.path.basename(fs_path))
 
             cached = ensure_cached_zip_member(app.root_path, cat, item)
-            return send_file(cached, as_attachment=True, download_name=os.path.basename(cached))
+            return send_download(cached, os.path.basename(cached))
 
 
         # Custom product download (served from digital_goods/custom_uploads)
@@ -3481,8 +5608,7 @@ def create_app() -> Flask:
             if pid not in purchased_ids:
                 abort(403, "Access denied")
 
-            catalog = get_catalog()
-            prod = next((p for p in catalog if p.id == pid), None)
+            prod = get_catalog_snapshot().by_id.get(pid)
             if not prod or not (prod.download_file or '').strip():
                 abort(404, "File not found")
 
@@ -3491,7 +5617,7 @@ def create_app() -> Flask:
             if not os.path.isfile(abs_path):
                 abort(404, "File not found")
 
-            return send_file(abs_path, as_attachment=True, download_name=os.path.basename(abs_path))
+            return send_download(abs_path, os.path.basename(abs_path))
 
         # Legacy digital_goods file download (manifest-based)
         relpath = str(data.get("p") or "").strip()
@@ -3502,7 +5628,7 @@ def create_app() -> Flask:
         if not os.path.isfile(abs_path):
             abort(404, "File not found on server")
 
-        return send_file(abs_path, as_attachment=True, download_name=os.path.basename(abs_path))
+        return send_download(abs_path, os.path.basename(abs_path))
 
 
 
@@ -3523,8 +5649,8 @@ def create_app() -> Flask:
         except Exception:
             return jsonify({"ok": False, "error": "Invalid payload"}), 400
 
-        catalog = get_catalog()
-        prod = next((p for p in catalog if p.id == pid), None)
+        snap = get_catalog_snapshot()
+        prod = snap.by_id.get(pid)
         if not prod:
             return jsonify({"ok": False, "error": "Unknown product"}), 404
 
@@ -3544,7 +5670,7 @@ def create_app() -> Flask:
             cart_data[pid] = min(99, int(cart_data.get(pid, 0)) + qty_int)
         session["cart"] = cart_data
 
-        summ = cart_summary(catalog)
+        summ = cart_summary(snap)
         return jsonify({"ok": True, "count": summ["count"], "total": summ["total"]})
 
     @app.post("/api/cart/update")
@@ -3561,14 +5687,14 @@ def create_app() -> Flask:
         except Exception:
             return jsonify({"ok": False, "error": "Invalid payload"}), 400
 
-        catalog = get_catalog()
-        prod = next((p for p in catalog if p.id == pid), None)
+        snap = get_catalog_snapshot()
+        prod = snap.by_id.get(pid)
         if prod and ((prod.docu_cat_slug and not prod.docu_item_id) or prod.id.startswith("cat:")):
             # Prevent category cards from ending up in the cart.
             cart_data = get_cart()
             cart_data.pop(pid, None)
             session["cart"] = cart_data
-            summ = cart_summary(catalog)
+            summ = cart_summary(snap)
             return jsonify({"ok": True, "count": summ["count"], "total": summ["total"]})
 
         if prod and prod.docu_cat_slug and prod.docu_item_id:
@@ -3578,7 +5704,7 @@ def create_app() -> Flask:
             else:
                 cart_data[pid] = 1
             session["cart"] = cart_data
-            summ = cart_summary(catalog)
+            summ = cart_summary(snap)
             return jsonify({"ok": True, "count": summ["count"], "total": summ["total"]})
 
         cart_data = get_cart()
@@ -3588,14 +5714,14 @@ def create_app() -> Flask:
             cart_data[pid] = min(99, qty_int)
         session["cart"] = cart_data
 
-        summ = cart_summary(catalog)
+        summ = cart_summary(snap)
         return jsonify({"ok": True, "count": summ["count"], "total": summ["total"]})
 
     @app.post("/api/cart/clear")
     def api_cart_clear():
         session["cart"] = {}
-        catalog = get_catalog()
-        summ = cart_summary(catalog)
+        snap = get_catalog_snapshot()
+        summ = cart_summary(snap)
         return jsonify({"ok": True, "count": summ["count"], "total": summ["total"]})
 
     return app
@@ -3603,4 +5729,24 @@ def create_app() -> Flask:
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5050, debug=True)
\ No newline at end of file
+    if sys.argv[1:2] == ["build-images"]:
+        # python app.py build-images: WebP/AVIF variants for every card and upload (needs Pillow).
+        if PILImage is None:
+            sys.exit(
+                "build-images: Pillow is not installed, so no WebP/AVIF derivatives can be written.\n"
+                "Install it with: pip install -r requirements.txt"
+            )
+        if not image_derivative_formats():
+            sys.exit("build-images: this Pillow build can encode neither WebP nor AVIF; upgrade Pillow (>=11.3).")
+        if "avif" not in image_derivative_formats():
+            print("build-images: this Pillow build has no AVIF encoder; writing WebP only.", file=sys.stderr)
+        roots = [os.path.join(app.static_folder, r) for r in ("cards", "uploads")]
+        rels = sorted(
+            os.path.relpath(os.path.join(r, rel), app.static_folder).replace(os.sep, "/")
+            for r in roots
+            for rel in _scan_files(r)
+        )
+        n = build_image_derivatives(app.static_folder, rels)
+        print(f"{n} image(s) encoded ({', '.join(image_derivative_formats())}); {len(rels)} checked")
+    else:
+        app.run(host="0.0.0.0", port=5050, debug=True)
\ No newline at end of file
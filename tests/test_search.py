@@ -0,0 +1,66 @@
+import os
+import sys
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import Product, SearchIndex  # noqa: E402
+
+
+def _product(pid: str, title: str, description: str = "") -> Product:
+    return Product(
+        id=pid,
+        title=title,
+        category="Zabiegi",
+        category_url="",
+        price_pln=0.0,
+        description=description,
+        images=(),
+        image_source="static",
+        source_url="",
+    )
+
+
+CATALOG = [
+    _product("cat:fizjoterapia", "Fizjoterapia"),
+    _product("cat:mezoterapia-iglowa", "Mezoterapia igłowa"),
+    _product("cat:mezoterapia-mikroiglowa", "Mezoterapia mikroigłowa"),
+    _product("cat:laminacja-brwi", "Laminacja brwi", "Zgoda na zabieg po terapii"),
+    _product("cat:depilacja", "Depilacja laserowa"),
+]
+
+
+def _ids(scores):
+    return {CATALOG[pos].id for pos in scores}
+
+
+def test_query_matches_inside_words():
+    # The old substring filter found these; the prefix index alone does not.
+    assert _ids(SearchIndex(CATALOG).search("terapia")) == {
+        "cat:fizjoterapia",
+        "cat:mezoterapia-iglowa",
+        "cat:mezoterapia-mikroiglowa",
+        "cat:laminacja-brwi",
+    }
+
+
+def test_prefix_matches_outrank_infix_matches():
+    catalog = CATALOG + [_product("cat:terapia-manualna", "Terapia manualna")]
+    scores = SearchIndex(catalog).search("terapia")
+    by_id = {catalog[pos].id: s for pos, s in scores.items()}
+    assert by_id["cat:terapia-manualna"] > by_id["cat:fizjoterapia"]
+
+
+def test_unknown_word_matches_nothing():
+    assert SearchIndex(CATALOG).search("xyzq") == {}
+
+
+def test_patched_index_matches_a_fresh_build():
+    edited = list(CATALOG)
+    edited[3] = replace(edited[3], title="Laminacja rzęs", description="Bez terapii")
+    patched = SearchIndex(CATALOG).patched([(3, CATALOG[3], edited[3])])
+    fresh = SearchIndex(edited)
+    assert patched.postings == fresh.postings
+    assert patched.terms == fresh.terms
+    for q in ("terapia", "rzes", "brwi", "laminacja"):
+        assert patched.search(q) == fresh.search(q)